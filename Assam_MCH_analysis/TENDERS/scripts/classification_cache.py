@@ -0,0 +1,85 @@
+import hashlib
+import json
+import sqlite3
+
+CACHE_NAME = "classification_cache.sqlite"
+LOOKUP_BATCH = 500
+
+
+def rules_fingerprint(*rules) -> str:
+    """
+    sha1 of the rules a classification was made with: lists, dicts and sets of strings,
+    sets compared regardless of their order.
+    """
+    def ordered(rule):
+        if isinstance(rule, (set, frozenset)):
+            return sorted(rule)
+        raise TypeError(f"Cannot fingerprint {type(rule).__name__}")
+    return hashlib.sha1(json.dumps(rules, default=ordered).encode("utf-8")).hexdigest()
+
+
+def text_hashes(*columns) -> list:
+    """
+    sha1 of every row of the text columns (Series or lists of strings), the values joined
+    by a separator that does not occur in tender text.
+    """
+    return [hashlib.sha1("\x1f".join(texts).encode("utf-8")).hexdigest() for texts in zip(*columns)]
+
+
+class ClassificationCache:
+    """
+    Results of classifying a tender, by the hash of its text and the fingerprint of the
+    rules it was classified with. A result is a JSON list of the classification columns.
+    Stored in one SQLite file: the parent process writes, the worker processes only look up.
+    """
+
+    def __init__(self, path: str, rules: str):
+        self.path = path
+        self.rules = rules
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS classifications "
+            "(text_hash TEXT, rules TEXT, result TEXT, PRIMARY KEY (text_hash, rules))"
+        )
+
+    def drop_other_rules(self) -> int:
+        """
+        Deletes the results of every other rules fingerprint, they can never be hit again.
+        Returns how many were deleted.
+        """
+        with self.connection:
+            deleted = self.connection.execute("DELETE FROM classifications WHERE rules != ?", (self.rules,)).rowcount
+        return deleted
+
+    def lookup(self, hashes) -> dict:
+        """
+        {text_hash: result} of the hashes classified before with the same rules
+        """
+        hashes = list(hashes)
+        found = {}
+        for start in range(0, len(hashes), LOOKUP_BATCH):
+            batch = hashes[start:start + LOOKUP_BATCH]
+            rows = self.connection.execute(
+                "SELECT text_hash, result FROM classifications WHERE rules = ? AND text_hash IN (%s)"
+                % ",".join("?" * len(batch)),
+                [self.rules] + batch
+            )
+            found.update((text_hash, json.loads(result)) for text_hash, result in rows)
+        return found
+
+    def store(self, results: dict):
+        """
+        Saves {text_hash: result}, result being a list of JSON values
+        """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO classifications VALUES (?, ?, ?)",
+                [(text_hash, self.rules, json.dumps(result)) for text_hash, result in results.items()]
+            )
+
+    def size(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
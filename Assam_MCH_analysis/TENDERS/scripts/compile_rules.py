@@ -0,0 +1,121 @@
+import pandas as pd
+import os
+import re
+import hashlib
+import json
+import pickle
+import argparse
+from keyword_matcher import KeywordMatcher, SchemeMatcher
+
+# The rules of mch_tenders.py: keyword groups, context tokens and scheme identifiers.
+# The structured equivalent of "Keyword list.md", edit this file to change the classification
+RULES_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'mch_rules.json'))
+ARTIFACT_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'mch_rules.pickle'))
+
+# Bump when the artifact's contents or the matcher classes change
+ARTIFACT_VERSION = 1
+
+def normalize_text(text: str) -> str:
+    """
+    Lowercase, strip non-alphanumeric (except space), collapse spaces.
+    Used for both tender text and scheme identifiers.
+    """
+    if pd.isna(text):
+        text = ""
+    text = str(text)
+    text = re.sub(r'[^a-zA-Z0-9\s]', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.lower().strip()
+
+def enrich_scheme_patterns(schemes_identifier: dict) -> dict:
+    """
+    For acronym-like patterns (alpha-only, no spaces), also add a spaced-out version
+    like 'n h m' so that 'N.H.M.' -> 'n h m' can be matched after normalization.
+    Skip 2-letter tokens to avoid garbage like 'mi'.
+    """
+    enriched = {}
+    for scheme, patterns in schemes_identifier.items():
+        new_patterns = set()
+        for p in patterns:
+            new_patterns.add(p)
+            base = p.replace(" ", "")
+            if base.isalpha() and 3 <= len(base) <= 6:
+                spaced = " ".join(list(base.lower()))
+                new_patterns.add(spaced)
+        enriched[scheme] = list(new_patterns)
+    return enriched
+
+def compile_rules(source: bytes) -> dict:
+    """
+    The artifact of the rules file's contents: the rules as read, the scheme identifiers
+    with their spaced acronyms, and the keyword and scheme matchers built from the
+    normalized patterns (the keyword matcher keeps the group of every keyword).
+    """
+    rules = json.loads(source.decode('utf-8'))
+    schemes_identifier = enrich_scheme_patterns(rules['schemes_identifier'])
+    return {
+        'version': ARTIFACT_VERSION,
+        'source_sha1': hashlib.sha1(source).hexdigest(),
+        'rules': rules,
+        'schemes_identifier': schemes_identifier,
+        'keyword_matcher': KeywordMatcher(rules['keyword_groups'], normalize_text),
+        'scheme_matcher': SchemeMatcher(schemes_identifier, normalize_text),
+    }
+
+def write_artifact(artifact: dict, artifact_path: str):
+    temporary_path = artifact_path + '.tmp'
+    with open(temporary_path, 'wb') as artifact_file:
+        pickle.dump(artifact, artifact_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, artifact_path)
+
+def read_artifact(artifact_path: str, source_sha1: str):
+    """
+    The artifact at artifact_path if it was compiled from rules with this sha1 and with the
+    same ARTIFACT_VERSION, else None.
+    """
+    if not os.path.exists(artifact_path):
+        return None
+    try:
+        with open(artifact_path, 'rb') as artifact_file:
+            artifact = pickle.load(artifact_file)
+        if artifact['version'] == ARTIFACT_VERSION and artifact['source_sha1'] == source_sha1:
+            return artifact
+    except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, KeyError, TypeError):
+        pass
+    return None
+
+def load_rules(rules_path: str = RULES_PATH, artifact_path: str = ARTIFACT_PATH) -> dict:
+    """
+    The artifact of the rules file, unpickled when it was compiled from the same contents
+    with the same ARTIFACT_VERSION, else compiled again in memory. Nothing is written,
+    save_rules writes it.
+    """
+    with open(rules_path, 'rb') as rules_file:
+        source = rules_file.read()
+    artifact = read_artifact(artifact_path, hashlib.sha1(source).hexdigest())
+    if artifact is not None:
+        return artifact
+    print(f"Compiling {os.path.basename(rules_path)}")
+    return compile_rules(source)
+
+def save_rules(artifact: dict, artifact_path: str = ARTIFACT_PATH):
+    """
+    Writes the artifact unless artifact_path already has the one of the same rules.
+    """
+    if read_artifact(artifact_path, artifact['source_sha1']) is None:
+        print(f"Writing {os.path.basename(artifact_path)}")
+        write_artifact(artifact, artifact_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compiles data/mch_rules.json into the matcher artifact data/mch_rules.pickle loaded by mch_tenders.py")
+    parser.add_argument("--rules", default=RULES_PATH, help="rules file")
+    parser.add_argument("--output", default=ARTIFACT_PATH, help="artifact to write")
+    args = parser.parse_args()
+
+    with open(args.rules, 'rb') as rules_file:
+        artifact = compile_rules(rules_file.read())
+    write_artifact(artifact, args.output)
+    keyword_count = len(artifact['keyword_matcher'].keyword_group)
+    pattern_count = sum(len(patterns) for patterns in artifact['schemes_identifier'].values())
+    print(f"{keyword_count} keywords in {len(artifact['rules']['keyword_groups'])} groups, "
+          f"{pattern_count} patterns of {len(artifact['schemes_identifier'])} schemes written to {args.output}")
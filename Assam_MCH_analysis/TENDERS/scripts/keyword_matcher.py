@@ -0,0 +1,131 @@
+from collections import deque
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over sequences of symbols (the words or the characters of a
+    text). Every state outputs the (output, length) of the patterns ending there.
+    """
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+
+    def add(self, symbols, output):
+        state = 0
+        for symbol in symbols:
+            if symbol not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+                self.goto[state][symbol] = len(self.goto) - 1
+            state = self.goto[state][symbol]
+        self.outputs[state].append((output, len(symbols)))
+
+    def link(self):
+        """
+        Failure links, breadth first: the longest proper suffix of a state that is also a
+        prefix of some pattern. A state also outputs the patterns of its failure state.
+        """
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for symbol, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fail = self.fail[state]
+                while fail and symbol not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[next_state] = self.goto[fail].get(symbol, 0)
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.fail[next_state]]
+
+    def matches(self, symbols):
+        """
+        (position of the last symbol, output, length) of every pattern in symbols, by end position
+        """
+        state = 0
+        for position, symbol in enumerate(symbols):
+            while state and symbol not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(symbol, 0)
+            for output, length in self.outputs[state]:
+                yield position, output, length
+
+
+class KeywordMatcher:
+    """
+    Automaton over the words of normalized text, built once from groups of keywords. One
+    scan of a text gives what re.findall(r"\b<keyword>\b", text) would count for every
+    keyword (non-overlapping matches, leftmost first), and the sum per group.
+
+    Works on text from normalize_text: words of [a-z0-9] separated by single spaces, so a
+    word boundary is a space or either end, and a keyword is matched as its list of words.
+    A keyword listed in several groups counts towards the first one.
+    """
+
+    def __init__(self, keyword_groups: dict, normalize):
+        self.automaton = AhoCorasick()
+        self.groups = list(keyword_groups)
+        self.keyword_group = {}
+        for group, keywords in keyword_groups.items():
+            for keyword in keywords:
+                if keyword in self.keyword_group:
+                    continue
+                self.keyword_group[keyword] = group
+                words = normalize(keyword).split()
+                if words:
+                    self.automaton.add(words, keyword)
+        self.automaton.link()
+
+    def scan(self, text_norm: str):
+        """
+        Returns ({keyword: count}, {group: count}) for a normalized text. Keywords and
+        groups without hits are left out of the first and are 0 in the second.
+        """
+        keyword_counts = {}
+        group_counts = dict.fromkeys(self.groups, 0)
+        next_start = {}
+        for position, keyword, length in self.automaton.matches(text_norm.split(" ") if text_norm else []):
+            # re.findall resumes after the end of the previous match of the keyword
+            if position - length + 1 >= next_start.get(keyword, 0):
+                keyword_counts[keyword] = keyword_counts.get(keyword, 0) + 1
+                group_counts[self.keyword_group[keyword]] += 1
+                next_start[keyword] = position + 1
+        return keyword_counts, group_counts
+
+
+class SchemeMatcher:
+    """
+    Automaton over the characters of normalized text, built once from the patterns of every
+    scheme. It keeps the rules of matching one pattern at a time:
+    - short single word patterns (4 characters or fewer, no spaces) match whole words only,
+      like re.search(r"\b<pattern>\b", text)
+    - longer or multi-word patterns, spaced acronyms included, match anywhere in the text
+    Patterns are normalized like the text, patterns empty once normalized never match.
+    """
+
+    def __init__(self, schemes_identifier: dict, normalize):
+        self.automaton = AhoCorasick()
+        for scheme, patterns in schemes_identifier.items():
+            for pattern in patterns:
+                pat_norm = normalize(pattern)
+                if not pat_norm:
+                    continue
+                whole_word = len(pat_norm) <= 4 and " " not in pat_norm
+                self.automaton.add(pat_norm, (scheme, whole_word))
+        self.automaton.link()
+
+    def schemes(self, text_norm: str) -> set:
+        """
+        Schemes with a pattern in the normalized text, in one scan of it
+        """
+        matched = set()
+        for end, (scheme, whole_word), length in self.automaton.matches(text_norm):
+            if scheme in matched:
+                continue
+            if whole_word:
+                start = end - length + 1
+                if (start > 0 and text_norm[start - 1] != " ") or (end + 1 < len(text_norm) and text_norm[end + 1] != " "):
+                    continue
+            matched.add(scheme)
+        return matched
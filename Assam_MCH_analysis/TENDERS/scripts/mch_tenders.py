@@ -3,6 +3,15 @@ import os
 import re
 import dateutil.parser
 import glob
+import json
+import sys
+import argparse
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from keyword_matcher import SchemeMatcher
+from compile_rules import normalize_text, load_rules, save_rules
+from classification_cache import CACHE_NAME, ClassificationCache, rules_fingerprint, text_hashes
 
 # input_df - after the scraper code is run
 data_path = os.getcwd() + r'/Assam_MCH_analysis/TENDERS/data/monthly_tenders/'
@@ -11,69 +20,62 @@ data_path = os.getcwd() + r'/Assam_MCH_analysis/TENDERS/data/monthly_tenders/'
 # Helpers
 # -----------------------------
 
-def populate_keyword_dict(keyword_list):
-    return {keyword: 0 for keyword in keyword_list}
-
-def normalize_text(text: str) -> str:
+def read_kept_months(index_path: str) -> dict:
     """
-    Lowercase, strip non-alphanumeric (except space), collapse spaces.
-    Used for both tender text and scheme identifiers.
+    {Tender ID: month whose copy is kept} of tender_index.json (written by
+    concatinate_raw_tenders.py: most advanced stage, then latest scrape), None without it.
     """
-    if pd.isna(text):
-        text = ""
-    text = str(text)
-    text = re.sub(r'[^a-zA-Z0-9\s]', ' ', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text.lower().strip()
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path, encoding='utf-8') as index_file:
+        return json.load(index_file)['kept']
 
-def text_contains_pattern(text_norm: str, pattern: str) -> bool:
+def drop_cross_month_duplicates(df: pd.DataFrame, index_path: str) -> pd.DataFrame:
     """
-    Decide how to search:
-    - For short, single word tokens (<=4 chars, no spaces): use word-boundary regex.
-    - For longer / multi-word phrases: use simple substring match on normalized text.
+    One row per Tender ID across months. The month kept is the one in tender_index.json,
+    else the latest month.
     """
-    pat_norm = normalize_text(pattern)
-    if not pat_norm:
-        return False
+    kept_months = read_kept_months(index_path)
+    if kept_months is not None:
+        df = df[df['Tender ID'].map(kept_months).fillna(df['month']) == df['month']]
+    df = df.sort_values('month', kind='stable').drop_duplicates(subset=['Tender ID'], keep='last')
+    return df.sort_index()
+
+@lru_cache(maxsize=4096)
+def normalize_text_cached(text: str) -> str:
+    """
+    normalize_text for the low-cardinality columns (Department, Organisation_Chain):
+    a few hundred distinct values across all months, so each is normalized once.
+    """
+    return normalize_text(text)
 
-    if len(pat_norm) <= 4 and " " not in pat_norm:
-        # short acronym-like token: jsy, uip, etc.
-        return re.search(r"\b%s\b" % re.escape(pat_norm), text_norm) is not None
+NORMALIZATION_CACHE_FIELDS = ('hits', 'misses', 'currsize')
 
-    # multi-word or longer phrase, or spaced acronym: substring match
-    return pat_norm in text_norm
+def normalization_cache_usage(before=None) -> dict:
+    """
+    {hits, misses, currsize} of normalize_text_cached in this process, since the cache_info()
+    before if given.
+    """
+    info = normalize_text_cached.cache_info()
+    return {field: getattr(info, field) - (getattr(before, field) if before else 0) for field in NORMALIZATION_CACHE_FIELDS}
 
-def enrich_scheme_patterns(schemes_identifier: dict) -> dict:
+def normalization_cache_report(usage: dict = None) -> str:
     """
-    For acronym-like patterns (alpha-only, no spaces), also add a spaced-out version
-    like 'n h m' so that 'N.H.M.' -> 'n h m' can be matched after normalization.
-    Skip 2-letter tokens to avoid garbage like 'mi'.
+    The normalization cache usage, summed over the worker processes when given, of this
+    process otherwise. Workers each keep their own cache, so their distinct values are summed.
     """
-    enriched = {}
-    for scheme, patterns in schemes_identifier.items():
-        new_patterns = set()
-        for p in patterns:
-            new_patterns.add(p)
-            base = p.replace(" ", "")
-            if base.isalpha() and 3 <= len(base) <= 6:
-                spaced = " ".join(list(base.lower()))
-                new_patterns.add(spaced)
-        enriched[scheme] = list(new_patterns)
-    return enriched
+    usage = usage if usage is not None else normalization_cache_usage()
+    lookups = usage['hits'] + usage['misses']
+    hit_rate = usage['hits'] / lookups if lookups else 0.0
+    return f"Normalization cache: {lookups} lookups, {usage['currsize']} distinct values, hit rate {hit_rate:.1%}"
 
-def find_schemes_for_tender(tender_text: str, schemes_identifier: dict) -> str:
+def find_schemes_for_tender(tender_text: str, scheme_matcher: SchemeMatcher) -> str:
     """
-    Given the concatenated tender text and SCHEMES_Identifier mapping,
+    Given the concatenated tender text and the SchemeMatcher of SCHEMES_Identifier,
     return a ';'-joined list of identified schemes (or '' if none).
+    Short tokens (<=4 chars, no spaces) match whole words, longer phrases match anywhere.
     """
-    text_norm = normalize_text(tender_text)
-    matched = set()
-
-    for scheme, patterns in schemes_identifier.items():
-        for pat in patterns:
-            if text_contains_pattern(text_norm, pat):
-                matched.add(scheme)
-                break
+    matched = scheme_matcher.schemes(normalize_text(tender_text))
 
     if not matched:
         return ""
@@ -83,111 +85,15 @@ def find_schemes_for_tender(tender_text: str, schemes_identifier: dict) -> str:
 # MCH keyword logic (GLOBAL)
 # -----------------------------
 
-CORE_MCH_KEYWORDS = [
-    # Pregnancy, delivery, mother & child (specific)
-    "maternal",
-    "maternity",
-    "mother and child",
-    "maternity and child health",
-    "pregnant woman",
-    "pregnant women",
-    "pregnancy care",
-    "institutional delivery",
-    "delivery point",
-    "labour room",
-    "labor room",
-    "labour ward",
-    "maternity ward",
-    "newborn",
-    "neonatal",
-    "infant",
-    "nicu",
-    "neonatal intensive care unit",
-    "sncu",
-    "special newborn care unit",
-    "newborn care unit",
-    "newborn stabilization unit",
-    "12 bedded sncu",
-]
-
-ANC_PNC_KEYWORDS = [
-    "antenatal care",
-    "antenatal clinic",
-    "anc check-up",
-    "anc check up",
-    "anc clinic",
-    "postnatal care",
-    "pnc visit",
-    "pnc clinic",
-    "gestational diabetes",
-    "screening of gestational diabetes",
-    "pregnant women screening",
-]
-
-IMMUNIZATION_CHILD_KEYWORDS = [
-    "immunization",
-    "immunisation",
-    "vaccination",
-    "vaccine",
-    "cold chain",
-    "ice lined refrigerator",
-    "ilr",
-    "deep freezer",
-    "vaccine carrier",
-    "cold box",
-    "child health",
-    "child health care",
-    "child health screening",
-    "school health programme",
-    "school health program",
-    "rbsk",
-    "rbsk screening",
-    "deic centre",
-    "deic center",
-    "early intervention centre",
-    "early intervention center",
-]
-
-NUTRITION_MCH_KEYWORDS = [
-    "nutrition rehabilitation",
-    "growth monitoring",
-    "malnutrition reduction",
-    "anganwadi centre",
-    "anganwadi center",
-    "icds centre",
-    "icds center",
-    "poshan",
-    "poshan abhiyaan",
-    "nutrition",
-]
-
-SCHEME_EXPLICIT_KEYWORDS = [
-    "jssk",
-    "samahar kit",
-    "jsy",
-    "janani suraksha yojana",
-    "janani shishu suraksha karyakram",
-    "pmsma",
-    "pmmvy",
-    "suman programme",
-    "suman maternity",
-    "mamoni",
-    "mamoni scheme",
-    "mamata kit",
-    "mamata",
-    "sneha sparsha",
-    "operation smile",
-    "assam free diagnostics",
-    "national maternity benefit scheme",
-    "nmbs",
-    "laqshya",
-    "laqshya guideline",
-    "equipment under maternal health",
-    "maternal health equipment",
-    "rch programme",
-    "rch program",
-    "reproductive and child health",
-]
+# Compiled from data/mch_rules.json by compile_rules.py: edit the rules there. Importing only
+# reads data/mch_rules.pickle, the main block writes it when the rules changed
+RULES = load_rules()
+
+CORE_MCH_KEYWORDS = RULES["rules"]["keyword_groups"]["core"]
+ANC_PNC_KEYWORDS = RULES["rules"]["keyword_groups"]["anc_pnc"]
+IMMUNIZATION_CHILD_KEYWORDS = RULES["rules"]["keyword_groups"]["imm_child"]
+NUTRITION_MCH_KEYWORDS = RULES["rules"]["keyword_groups"]["nutrition"]
+SCHEME_EXPLICIT_KEYWORDS = RULES["rules"]["keyword_groups"]["scheme"]
 
 POSITIVE_KEYWORDS = list(
     dict.fromkeys(
@@ -200,7 +106,47 @@ POSITIVE_KEYWORDS = list(
 )
 
 # Negative context: anything here is a strong hint to *exclude* from human MCH
-NEGATIVE_KEYWORDS = ["veterinary", "husbandry", "animal", "livestock"]
+NEGATIVE_KEYWORDS = RULES["rules"]["keyword_groups"]["negative"]
+
+# Groups in the order mch_filter_strict counts a keyword towards
+KEYWORD_GROUPS = RULES["rules"]["keyword_groups"]
+KEYWORD_MATCHER = RULES["keyword_matcher"]
+
+# Health facility words that let an explicit scheme keyword count as MCH
+HEALTH_CONTEXT_TOKENS = RULES["rules"]["health_context_tokens"]
+
+# -----------------------------
+# Keyword hit columns
+# -----------------------------
+
+def encode_keyword_hits(keyword_counts: dict, keywords: list) -> str:
+    """
+    The keywords hit, as "keyword=count;keyword=count" in the order of keywords.
+    Keywords without hits are left out, a text without any hit gives "".
+    """
+    return ";".join(f"{keyword}={keyword_counts[keyword]}" for keyword in keywords if keyword_counts.get(keyword))
+
+def read_keyword_hits(values: pd.Series, keywords: list = None) -> pd.DataFrame:
+    """
+    An encoded keyword column (positive_keywords_dict or negative_keywords_dict) as one
+    integer column of hit counts per keyword, 0 where the keyword was not hit. Reads both
+    encode_keyword_hits values and the str(dict) of every keyword of older outputs.
+    keywords gives the columns and their order, by default the keywords found in values.
+    """
+    index = values.index
+    values = values.fillna("").astype(str).reset_index(drop=True)
+    legacy = values.str.startswith("{")
+    hits = pd.concat([
+        values[~legacy].str.extractall(r"([^;=]+)=(\d+)"),
+        values[legacy].str.extractall(r"'([^']+)': (\d+)"),
+    ])
+    if hits.empty:
+        counts = pd.DataFrame(0, index=values.index, columns=keywords or [])
+    else:
+        counts = hits[1].astype("int64").groupby([hits.index.get_level_values(0), hits[0]]).sum().unstack(fill_value=0)
+    counts = counts.reindex(index=values.index, columns=keywords, fill_value=0)
+    counts.columns.name = None
+    return counts.set_axis(index)
 
 # -----------------------------
 # Strict MCH filter (semantic)
@@ -209,67 +155,29 @@ NEGATIVE_KEYWORDS = ["veterinary", "husbandry", "animal", "livestock"]
 def mch_filter_strict(row):
     """
     Strict semantic MCH classifier based on clinical / programme language.
-    Returns: (is_mch_strict, positive_kw_dict_str, negative_kw_dict_str)
+    Returns: (is_mch_strict, positive_kw_hits, negative_kw_hits), the hits as encode_keyword_hits strings
     """
-    positive_keywords_dict = populate_keyword_dict(POSITIVE_KEYWORDS)
-    negative_keywords_dict = populate_keyword_dict(NEGATIVE_KEYWORDS)
-
     tender_slug = f"{row.get('tender_externalreference', '')} {row.get('tender_title', '')} {row.get('Work Description', '')}"
     tender_slug_norm = normalize_text(tender_slug)
 
-    # group-level scores
-    core_hits = 0
-    anc_pnc_hits = 0
-    imm_child_hits = 0
-    nutrition_hits = 0
-    scheme_hits = 0
-
-    core_set = set(CORE_MCH_KEYWORDS)
-    anc_pnc_set = set(ANC_PNC_KEYWORDS)
-    imm_child_set = set(IMMUNIZATION_CHILD_KEYWORDS)
-    nutrition_set = set(NUTRITION_MCH_KEYWORDS)
-    scheme_set = set(SCHEME_EXPLICIT_KEYWORDS)
-
     # -------------------
-    # Positive keywords
+    # Keyword and group hits, word-boundary counts in one scan of the slug
     # -------------------
-    for keyword in POSITIVE_KEYWORDS:
-        kw_norm = normalize_text(keyword)
-        if not kw_norm:
-            count = 0
-        else:
-            count = len(re.findall(r"\b%s\b" % re.escape(kw_norm), tender_slug_norm))
-        positive_keywords_dict[keyword] = count
-
-        if count > 0:
-            if keyword in core_set:
-                core_hits += count
-            elif keyword in anc_pnc_set:
-                anc_pnc_hits += count
-            elif keyword in imm_child_set:
-                imm_child_hits += count
-            elif keyword in nutrition_set:
-                nutrition_hits += count
-            elif keyword in scheme_set:
-                scheme_hits += count
+    keyword_counts, group_hits = KEYWORD_MATCHER.scan(tender_slug_norm)
+    positive_keyword_hits = encode_keyword_hits(keyword_counts, POSITIVE_KEYWORDS)
+    negative_keyword_hits = encode_keyword_hits(keyword_counts, NEGATIVE_KEYWORDS)
 
-    # -------------------
-    # Negative keywords (now actually used)
-    # -------------------
-    neg_hits = 0
-    for keyword in NEGATIVE_KEYWORDS:
-        kw_norm = normalize_text(keyword)
-        if not kw_norm:
-            count = 0
-        else:
-            count = len(re.findall(r"\b%s\b" % re.escape(kw_norm), tender_slug_norm))
-        negative_keywords_dict[keyword] = count
-        neg_hits += count
+    core_hits = group_hits["core"]
+    anc_pnc_hits = group_hits["anc_pnc"]
+    imm_child_hits = group_hits["imm_child"]
+    nutrition_hits = group_hits["nutrition"]
+    scheme_hits = group_hits["scheme"]
+    neg_hits = group_hits["negative"]
 
     # HARD VETO:
     # If any negative keyword appears, do NOT treat as MCH, even if 'vaccine' etc. appear.
     if neg_hits > 0:
-        return "False", str(positive_keywords_dict), str(negative_keywords_dict)
+        return "False", positive_keyword_hits, negative_keyword_hits
 
     # -------------------
     # Decision logic
@@ -278,89 +186,37 @@ def mch_filter_strict(row):
 
     strong_signal = (core_hits > 0) or (anc_pnc_hits > 0) or (imm_child_hits > 0)
     support_signal = (nutrition_hits > 0)
-    health_context = any(
-        h in tender_slug_norm
-        for h in [
-            "phc", "chc", "sub centre", "sub-center", "subcentre",
-            "civil hospital", "district hospital", "sdch", "mdch",
-            "medical college", "health centre", "health center"
-        ]
-    )
+    health_context = any(h in tender_slug_norm for h in HEALTH_CONTEXT_TOKENS)
 
     if strong_signal:
         is_mch_tender = True
     elif scheme_hits > 0 and (strong_signal or support_signal or health_context):
         is_mch_tender = True
 
-    return str(is_mch_tender), str(positive_keywords_dict), str(negative_keywords_dict)
+    return str(is_mch_tender), positive_keyword_hits, negative_keyword_hits
 
 # -----------------------------
 # Health org & broad MCH tagging (OCP-ish)
 # -----------------------------
 
+HEALTH_ORG_TOKENS = RULES["rules"]["health_org_tokens"]
+
 def is_health_org(row) -> bool:
     """
     Check if Department / Organisation_Chain clearly belongs to health sector /
     NHM / H&FW / PWD-NH etc.
     """
-    dept = normalize_text(str(row.get("Department", "")))
-    org = normalize_text(str(row.get("Organisation_Chain", "")))
+    dept = normalize_text_cached(str(row.get("Department", "")))
+    org = normalize_text_cached(str(row.get("Organisation_Chain", "")))
     text = dept + " " + org
 
-    health_tokens = [
-        "national health mission",
-        "nhm assam",
-        "state programme management unit nhm",
-        "health and family welfare",
-        "health & family welfare",
-        "health department",
-        "directorate of health services",
-        "medical college",
-        "civil hospital",
-        "district hospital",
-        "sdch",
-        "mdch",
-        "pwd nh",
-        "public works department nh",
-        "public works department national health",
-        "public works department nh division",
-    ]
+    return any(tok in text for tok in HEALTH_ORG_TOKENS)
 
-    return any(tok in text for tok in health_tokens)
-
-MCH_SCHEME_CODES = {
-    "UIP",
-    "ASHA",
-    "JSY",
-    "JSSK",
-    "PMSMA",
-    "PMMVY",
-    "NMBS",
-    "RBSK",
-    "POSHAN_ABHIYAAN",
-    "SUMAN",
-    "MAMONI",
-    "MAMATA_KIT",
-    "SNEHA_SPARSHA",
-    "CHD_SCHEME",
-    "OPERATION_SMILE",
-    "MAJONI",
-    "ASSAM_FREE_DIAGNOSTICS",
-    "RCH",
-}
+MCH_SCHEME_CODES = set(RULES["rules"]["mch_scheme_codes"])
 
-INFRA_MCH_TOKENS = [
-    "mch wing",
-    "maternal and child health wing",
-    "mch block",
-    "maternity ward",
-    "labour room",
-    "labor room",
-    "maternity ot",
-    "maternity operating theatre",
-    "ivf centre",
-    "ivf center",
-]
+INFRA_MCH_TOKENS = RULES["rules"]["infra_mch_tokens"]
+
+VET_TOKENS = RULES["rules"]["vet_tokens"]
 
 def mark_mch_broad(row) -> bool:
     """
@@ -372,13 +228,12 @@ def mark_mch_broad(row) -> bool:
     tender_slug_norm = normalize_text(
         str(row.get("tender_title", "")) + " " + str(row.get("Work Description", ""))
     )
-    dept_org_norm = normalize_text(
+    dept_org_norm = normalize_text_cached(
         str(row.get("Department", "")) + " " + str(row.get("Organisation_Chain", ""))
     )
 
     # Explicit veterinary guardrail
-    vet_tokens = ["veterinary", "animal husbandry", "livestock"]
-    if any(tok in tender_slug_norm for tok in vet_tokens) or any(tok in dept_org_norm for tok in vet_tokens):
+    if any(tok in tender_slug_norm for tok in VET_TOKENS) or any(tok in dept_org_norm for tok in VET_TOKENS):
         return False
 
     # Use strict flag (renamed)
@@ -402,263 +257,11 @@ def mark_mch_broad(row) -> bool:
 # Scheme identifiers (GLOBAL)
 # -----------------------------
 
-SCHEMES_IDENTIFIER_BASE = {
-    # Immunization & child health
-    "UIP": [
-        "universal immunization programme",
-        "universal immunisation programme",
-        "UIP",
-        "uip",
-        "vaccine",
-        "immunization",
-        "immunisation",
-        "cold chain",
-        "ice lined refrigerator",
-        "ilr",
-        "deep freezer",
-        "vaccine carrier",
-        "cold box",
-    ],
-
-    # ASHA & community health workers
-    "ASHA": [
-        "ASHA worker",
-        "asha worker",
-        "ASHA training",
-        "asha training",
-        "ASHA incentive",
-        "asha incentive",
-        "ASHA module",
-        "asha module",
-        "community health volunteer",
-        "field health worker training",
-        "asha reporting tools",
-        "accredited social health activist",
-    ],
-
-    # Maternal benefit & delivery schemes
-    "JSY": [
-        "janani suraksha yojana",
-        "JSY",
-        "jsy",
-        "institutional delivery incentive",
-        "cash incentive delivery",
-        "referral transport pregnant women",
-        "jsy beneficiary",
-        "delivery incentive scheme",
-    ],
-    "JSSK": [
-        "janani shishu suraksha karyakram",
-        "JSSK",
-        "jssk",
-        "free delivery",
-        "free c-section",
-        "free medicines pregnant women",
-        "free diagnostics pregnant women",
-        "free transport mother newborn",
-        "diet provision pregnant women",
-        "jssk newborn package",
-        "samahar kit",
-    ],
-    "PMSMA": [
-        "PMSMA",
-        "pmsma",
-        "pmsma clinic",
-        "anc check-up 9th of month",
-        "pmsma diagnostics",
-        "specialist anc camp",
-        "pregnancy screening pmsma",
-        "pradhan mantri surakshit matritva abhiyan",
-    ],
-    "LAQSHYA": [
-        "LAQSHYA",
-        "laqshya",
-        "laqshya labour room",
-        "labour room strengthening",
-        "delivery room quality",
-        "maternity ot upgradation",
-        "laqshya certification",
-        "laqshya facility improvement",
-    ],
-    "PMMVY": [
-        "PMMVY",
-        "pmmvy",
-        "pradhan mantri matru vandana yojana",
-        "maternity benefit first child",
-        "cash benefit pregnant women",
-        "pmmvy payment system",
-        "mother benefit scheme",
-    ],
-    "NMBS": [
-        "NMBS",
-        "nmbs",
-        "national maternity benefit scheme",
-        "maternal nutritional benefit",
-        "pregnant women cash support nmbs",
-    ],
-
-    # Child screening & DEIC
-    "RBSK": [
-        "RBSK",
-        "rbsk",
-        "rbsk screening",
-        "deic centre",
-        "deic center",
-        "early intervention centre",
-        "child screening 0-18 years",
-        "birth defect screening",
-        "rbsk mobile team",
-    ],
-
-    # Nutrition & POSHAN
-    "POSHAN_ABHIYAAN": [
-        "POSHAN",
-        "poshan",
-        "POSHAN Abhiyaan",
-        "poshan abhiyaan",
-        "nutrition monitoring",
-        "growth monitoring devices",
-        "ict-rtm anganwadi",
-        "nutrition rehabilitation",
-        "malnutrition reduction",
-    ],
-
-    # Respectful maternity care
-    "SUMAN": [
-        "SUMAN",
-        "suman",
-        "suman programme",
-        "suman maternity service",
-        "respectful maternity care",
-        "suman certification",
-        "zero expense delivery",
-        "maternal newborn assured care",
-    ],
-
-    # Digital tracking
-    "MCTS": [
-        "MCTS",
-        "mcts",
-        "mother child tracking",
-        "mcts portal",
-        "digital anc tracking",
-        "digital pnc tracking",
-        "immunization tracking system",
-    ],
-
-    # Assam-specific MCH schemes
-    "MAMONI": [
-        "MAMONI",
-        "mamoni",
-        "mamoni scheme",
-        "anc nutrition assistance",
-        "pregnant women nutrition cash",
-        "assam mamoni",
-    ],
-    "MAMATA_KIT": [
-        "mamata",
-        "mamata kit",
-        "Mamata kit",
-        "newborn care kit",
-        "mother kit distribution",
-        "post-delivery kit",
-        "assam mamata kit",
-    ],
-    "SNEHA_SPARSHA": [
-        "sneha sparsha",
-        "Sneha Sparsha",
-        "financial aid child treatment",
-        "specialized treatment child",
-        "paediatric tertiary care support",
-    ],
-    "CHD_SCHEME": [
-        "congenital heart disease scheme",
-        "CHD",
-        "chd",
-        "chd scheme",
-        "congenital heart surgery child",
-        "paediatric cardiac surgery",
-        "free heart surgery child",
-    ],
-    "OPERATION_SMILE": [
-        "Operation Smile",
-        "operation smile",
-        "cleft lip surgery",
-        "cleft palate surgery",
-        "free cleft surgery assam",
-    ],
-    "MAJONI": [
-        "Majoni",
-        "majoni",
-        "majoni scheme",
-        "girl child security scheme",
-        "assam majoni benefit",
-    ],
-    "ASSAM_FREE_DIAGNOSTICS": [
-        "assam free diagnostics",
-        "Assam Free Diagnostics",
-        "free maternal diagnostics",
-        "free pregnancy tests",
-        "free drugs pregnant women",
-        "free lab tests assam",
-    ],
-
-    # Broader health-system schemes supporting MCH
-    "RCH": [
-        "RCH",
-        "rch",
-        "rch programme",
-        "reproductive and child health",
-        "maternal child health rch",
-        "rch facility strengthening",
-        "rch phase ii",
-        "rch register",
-    ],
-    
-    "NHM": [
-        "NHM",
-        "nhm",
-        "NRHM",
-        "nrhm",
-        "nhm facility strengthening",
-        "nrhm infrastructure",
-        "chc upgradation nhm",
-        "phc upgradation nhm",
-        "district hospital mch strengthening",
-    ],
-    "MSDP": [
-        "MSDP",
-        "msdp",
-        "Multi Sectoral Development Programme",
-    ],
-    "SOPD": [
-        "SOPD",
-        "sopd",
-        "State Owned Priority Development",
-    ],
-
-    # New schemes / departments
-    "HFW": [
-        "Health and Family Welfare Department",
-        "Health & Family Welfare Department",
-        "Department of Health and Family Welfare",
-        "H&FW",
-        "H & FW",
-        "HFW",
-        "health and family welfare",
-    ],
-    "PWD_NH": [
-        "Public Works Department (NH)",
-        "Public Works Department - National Health",
-        "PWD (NH)",
-        "PWD-NH",
-        "PWD NH",
-        "pwd nh",
-        "chief engineer pwd nh",
-    ],
-}
+SCHEMES_IDENTIFIER_BASE = RULES["rules"]["schemes_identifier"]
 
-SCHEMES_Identifier = enrich_scheme_patterns(SCHEMES_IDENTIFIER_BASE)
+# With the spaced acronyms of enrich_scheme_patterns
+SCHEMES_Identifier = RULES["schemes_identifier"]
+SCHEME_MATCHER = RULES["scheme_matcher"]
 
 VALID_AWARDED_STATUSES = {
     "Accepted-AOC",
@@ -671,20 +274,185 @@ VALID_AWARDED_STATUSES = {
 }
 
 # -----------------------------
-# Main process
+# Classification engines
 # -----------------------------
 
-csvs = glob.glob(data_path + '*.csv')
-print('Total CSVs to process: ', len(csvs))
+def build_tender_text_for_scheme(row):
+    return " ".join([
+        str(row.get('tender_title', '')),
+        str(row.get('tender_externalreference', '')),
+        str(row.get('Work Description', '')),
+        str(row.get('Department', '')),
+        str(row.get('Organisation_Chain', '')),
+    ])
 
-out_dir = os.path.join(os.getcwd(), 'Assam_MCH_analysis', 'TENDERS', 'data', 'mch_tenders')
-os.makedirs(out_dir, exist_ok=True)
+def classify_rowwise(input_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the classification columns one row at a time with mch_filter_strict,
+    find_schemes_for_tender and mark_mch_broad.
+    """
+    # Strict MCH filter
+    mch_filter_tuples = input_df.apply(mch_filter_strict, axis=1)
+    input_df.loc[:, 'is_mch_strict'] = [var[0] for var in list(mch_filter_tuples)]
+    input_df.loc[:, 'positive_keywords_dict'] = [var[1] for var in list(mch_filter_tuples)]
+    input_df.loc[:, 'negative_keywords_dict'] = [var[2] for var in list(mch_filter_tuples)]
 
-for csv in csvs:
-    filename  = csv.split(r'/')[-1]
-    filename  = re.split(r'\\', csv)[-1]
-    input_df = pd.read_csv(csv)
+    # Scheme tagging on full tender universe
+    input_df['Scheme'] = input_df.apply(
+        lambda r: find_schemes_for_tender(build_tender_text_for_scheme(r), SCHEME_MATCHER),
+        axis=1
+    )
+
+    # Award flag separate from classification
+    input_df['is_awarded'] = input_df['Status'].isin(VALID_AWARDED_STATUSES)
+
+    # Broad MCH tagging (OCP-style: schemes + health org + infra + vet-guard)
+    input_df['is_mch_broad'] = input_df.apply(mark_mch_broad, axis=1)
+    return input_df
 
+def text_column(df: pd.DataFrame, column: str) -> pd.Series:
+    """
+    A column as the row-wise functions read it with str(row.get(column, '')):
+    'nan' for missing values, '' on every row when the column is absent.
+    """
+    if column not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[column].astype(str)
+
+def normalize_series(texts: pd.Series) -> pd.Series:
+    """
+    normalize_text for a whole column.
+    """
+    texts = texts.str.replace(r'[^a-zA-Z0-9\s]', ' ', regex=True)
+    texts = texts.str.replace(r'\s+', ' ', regex=True)
+    return texts.str.lower().str.strip()
+
+def normalize_unique(texts: pd.Series) -> pd.Series:
+    """
+    normalize_series for low-cardinality columns: every distinct value is normalized
+    once (through normalize_text_cached) and mapped back to the rows by its code.
+    """
+    codes, uniques = pd.factorize(texts)
+    normalized = np.array([normalize_text_cached(text) for text in uniques] + [""], dtype=object)
+    return pd.Series(normalized[codes], index=texts.index, dtype=object)
+
+def join_normalized(*parts: pd.Series) -> pd.Series:
+    """
+    normalize_text of the parts joined by spaces, from the already normalized parts:
+    the non-empty ones joined by single spaces.
+    """
+    return pd.Series([" ".join(part for part in row if part) for row in zip(*parts)], index=parts[0].index, dtype=object)
+
+def contains_any(texts: pd.Series, tokens: list) -> pd.Series:
+    """
+    True where any of the tokens is a substring of the text.
+    """
+    return texts.str.contains("|".join(re.escape(tok) for tok in tokens), regex=True)
+
+def classify_vectorized(input_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the same classification columns as classify_rowwise, column by column:
+    the text columns are normalized once as Series, the keyword and scheme matchers
+    scan each text once, and the flags are combined as boolean columns.
+    """
+    title = text_column(input_df, 'tender_title')
+    reference = text_column(input_df, 'tender_externalreference')
+    description = text_column(input_df, 'Work Description')
+    department = text_column(input_df, 'Department')
+    organisation = text_column(input_df, 'Organisation_Chain')
+
+    # Strict MCH filter: group hits, veto and decision
+    strict_slug = normalize_series(reference + " " + title + " " + description)
+    scans = [KEYWORD_MATCHER.scan(text) for text in strict_slug]
+    group_hits = pd.DataFrame([group_counts for keyword_counts, group_counts in scans],
+                              index=input_df.index, columns=list(KEYWORD_GROUPS))
+    strong_signal = (group_hits['core'] > 0) | (group_hits['anc_pnc'] > 0) | (group_hits['imm_child'] > 0)
+    support_signal = group_hits['nutrition'] > 0
+    health_context = contains_any(strict_slug, HEALTH_CONTEXT_TOKENS)
+    is_strict = (group_hits['negative'] == 0) & (
+        strong_signal | ((group_hits['scheme'] > 0) & (support_signal | health_context))
+    )
+    input_df['is_mch_strict'] = is_strict.map({True: "True", False: "False"}).astype(object)
+    input_df['positive_keywords_dict'] = [
+        encode_keyword_hits(keyword_counts, POSITIVE_KEYWORDS) for keyword_counts, group_counts in scans
+    ]
+    input_df['negative_keywords_dict'] = [
+        encode_keyword_hits(keyword_counts, NEGATIVE_KEYWORDS) for keyword_counts, group_counts in scans
+    ]
+
+    # Scheme tagging on full tender universe
+    department_norm = normalize_unique(department)
+    organisation_norm = normalize_unique(organisation)
+    scheme_text = join_normalized(
+        normalize_series(title + " " + reference + " " + description), department_norm, organisation_norm
+    )
+    input_df['Scheme'] = [";".join(sorted(SCHEME_MATCHER.schemes(text))) for text in scheme_text]
+
+    # Award flag separate from classification
+    input_df['is_awarded'] = input_df['Status'].isin(VALID_AWARDED_STATUSES)
+
+    # Broad MCH tagging (OCP-style: schemes + health org + infra + vet-guard)
+    broad_slug = normalize_series(title + " " + description)
+    dept_org = join_normalized(department_norm, organisation_norm)
+    vet = contains_any(broad_slug, VET_TOKENS) | contains_any(dept_org, VET_TOKENS)
+    health_org = contains_any(department_norm + " " + organisation_norm, HEALTH_ORG_TOKENS)
+    scheme_hits = input_df['Scheme'].str.contains(
+        r"(?:^|;)\s*(?:%s)\s*(?:;|$)" % "|".join(re.escape(code) for code in MCH_SCHEME_CODES), regex=True
+    )
+    infra_hits = contains_any(broad_slug, INFRA_MCH_TOKENS)
+    input_df['is_mch_broad'] = ~vet & (is_strict | (health_org & (scheme_hits | infra_hits)))
+    return input_df
+
+ENGINES = {"rowwise": classify_rowwise, "vectorized": classify_vectorized}
+
+# -----------------------------
+# Classification cache
+# -----------------------------
+
+# Bump when the classification logic changes without any of the rules below changing
+CLASSIFIER_VERSION = 1
+
+RULES_FINGERPRINT = rules_fingerprint(
+    CLASSIFIER_VERSION, KEYWORD_GROUPS, HEALTH_CONTEXT_TOKENS, HEALTH_ORG_TOKENS,
+    MCH_SCHEME_CODES, INFRA_MCH_TOKENS, VET_TOKENS, SCHEMES_IDENTIFIER_BASE
+)
+
+# Every column the engines classify a tender by (is_awarded only reads Status and is not cached)
+CLASSIFIED_TEXT_COLUMNS = ['tender_title', 'tender_externalreference', 'Work Description', 'Department', 'Organisation_Chain']
+CACHED_COLUMNS = ['is_mch_strict', 'positive_keywords_dict', 'negative_keywords_dict', 'Scheme', 'is_mch_broad']
+
+def classify_cached(input_df: pd.DataFrame, engine: str, cache: ClassificationCache) -> tuple:
+    """
+    Adds the columns of ENGINES[engine], classifying only the tenders whose text was not
+    classified before with the same rules and taking the others from the cache.
+    Returns the frame and the {text_hash: result} of the newly classified tenders, for the
+    parent process to store.
+    """
+    hashes = text_hashes(*(text_column(input_df, column) for column in CLASSIFIED_TEXT_COLUMNS))
+    results = cache.lookup(set(hashes))
+    missed = [text_hash not in results for text_hash in hashes]
+    new_results = {}
+    if any(missed):
+        classified = ENGINES[engine](input_df[missed].copy())
+        missed_hashes = [text_hash for text_hash, miss in zip(hashes, missed) if miss]
+        for text_hash, strict, positive, negative, scheme, broad in zip(
+                missed_hashes, *(classified[column] for column in CACHED_COLUMNS)):
+            new_results[text_hash] = [strict, positive, negative, scheme, bool(broad)]
+        results.update(new_results)
+
+    rows = [results[text_hash] for text_hash in hashes]
+    for position, column in enumerate(CACHED_COLUMNS[:4]):
+        input_df[column] = [row[position] for row in rows]
+    # Award flag separate from classification
+    input_df['is_awarded'] = input_df['Status'].isin(VALID_AWARDED_STATUSES)
+    input_df['is_mch_broad'] = [row[4] for row in rows]
+    return input_df, new_results
+
+# -----------------------------
+# Main process
+# -----------------------------
+
+def clean_tenders(input_df: pd.DataFrame) -> pd.DataFrame:
     # De-Duplication (basic)
     input_df = input_df.drop_duplicates()
 
@@ -701,76 +469,370 @@ for csv in csvs:
                 .str.strip(),
             errors="coerce"
         ).fillna(0)
+    return input_df
 
-    # Strict MCH filter
-    mch_filter_tuples = input_df.apply(mch_filter_strict, axis=1)
-    input_df.loc[:, 'is_mch_strict'] = [var[0] for var in list(mch_filter_tuples)]
-    input_df.loc[:, 'positive_keywords_dict'] = [var[1] for var in list(mch_filter_tuples)]
-    input_df.loc[:, 'negative_keywords_dict'] = [var[2] for var in list(mch_filter_tuples)]
-
-    # Scheme tagging on full tender universe
-    def build_tender_text_for_scheme(row):
-        return " ".join([
-            str(row.get('tender_title', '')),
-            str(row.get('tender_externalreference', '')),
-            str(row.get('Work Description', '')),
-            str(row.get('Department', '')),
-            str(row.get('Organisation_Chain', '')),
-        ])
+def read_monthly_tenders(csv: str) -> pd.DataFrame:
+    return clean_tenders(pd.read_csv(csv))
 
-    input_df['Scheme'] = input_df.apply(
-        lambda r: find_schemes_for_tender(build_tender_text_for_scheme(r), SCHEMES_Identifier),
-        axis=1
-    )
-
-    # Award flag separate from classification
-    input_df['is_awarded'] = input_df['Status'].isin(VALID_AWARDED_STATUSES)
-
-    # Broad MCH tagging (OCP-style: schemes + health org + infra + vet-guard)
-    input_df['is_mch_broad'] = input_df.apply(mark_mch_broad, axis=1)
-
-    # Filter to MCH-broad tenders in relevant departments (but keep non-AOC)
+def mch_broad_tenders(input_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The MCH-broad tenders of a classified frame in relevant departments (but keep non-AOC)
+    """
     dept_series = input_df['Department'].fillna("")
-    idea_mch_df = input_df[
+    return input_df[
         (input_df['is_mch_broad'] == True) &
         (~dept_series.str.contains("Animal Husbandry", case=False)) &
         (~dept_series.str.contains("Veterinary", case=False)) &
         (~dept_series.str.contains("Sericulture", case=False))
     ]
 
+def classify_month(csv: str, engine: str, cache_path: str = None):
+    """
+    Classifies one monthly csv, through the classification cache at cache_path if given.
+    Returns its file name, its MCH-broad tenders in relevant departments (non-AOC kept),
+    the number of MCH-strict tenders, the newly classified {text_hash: result} and the
+    normalization cache usage of the month.
+    Runs in the worker processes of the pool, the parent writes the outputs and the cache.
+    """
+    cache_before = normalize_text_cached.cache_info()
+    filename = os.path.basename(csv)
+    input_df = read_monthly_tenders(csv)
+    new_results = {}
+    if cache_path is None:
+        input_df = ENGINES[engine](input_df)
+    else:
+        cache = ClassificationCache(cache_path, RULES_FINGERPRINT)
+        input_df, new_results = classify_cached(input_df, engine, cache)
+        cache.close()
+
+    idea_mch_df = mch_broad_tenders(input_df)
     strict_count = (input_df['is_mch_strict'] == 'True').sum()
+    return filename, idea_mch_df, strict_count, new_results, normalization_cache_usage(cache_before)
 
-    print(
-        f"{filename}: strict={strict_count}, "
-        f"broad={idea_mch_df.shape[0]}, "
-        f"awarded_broad={idea_mch_df['is_awarded'].sum()}"
-    )
-
-    if idea_mch_df.shape[0] == 0:
-        continue
-
-    idea_mch_df.to_csv(
-        os.path.join(out_dir, filename),
-        encoding='utf-8',
-        index=False
-    )
+def classify_months(csvs: list, engine: str, processes: int, cache_path: str = None):
+    """
+    Yields classify_month of every csv in sorted order, from a pool of processes when there is
+    more than one
+    """
+    csvs = sorted(csvs)
+    if processes <= 1:
+        for csv in csvs:
+            yield classify_month(csv, engine, cache_path)
+        return
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        yield from executor.map(classify_month, csvs, [engine] * len(csvs), [cache_path] * len(csvs))
+
+def write_monthly_outputs(results, out_dir: str, cache: ClassificationCache = None) -> list:
+    """
+    Writes the MCH-broad tenders of every month to out_dir as the results come in, and
+    stores the newly classified tenders in the cache. Reports the normalization cache usage
+    summed over the months.
+    Returns the frames written, with their month, for the combined file.
+    """
+    dfs = []
+    # months classified in separate workers can share a text, it is stored and counted once
+    classified = set()
+    normalization_usage = dict.fromkeys(NORMALIZATION_CACHE_FIELDS, 0)
+    for filename, idea_mch_df, strict_count, new_results, month_usage in results:
+        for field, value in month_usage.items():
+            normalization_usage[field] += value
+        if cache is not None and new_results:
+            cache.store(new_results)
+            classified.update(new_results)
+
+        print(
+            f"{filename}: strict={strict_count}, "
+            f"broad={idea_mch_df.shape[0]}, "
+            f"awarded_broad={idea_mch_df['is_awarded'].sum()}"
+        )
+
+        if idea_mch_df.shape[0] == 0:
+            continue
+
+        idea_mch_df.to_csv(
+            os.path.join(out_dir, filename),
+            encoding='utf-8',
+            index=False
+        )
+        dfs.append(idea_mch_df.assign(month=filename[:7]))
+    if cache is not None:
+        print(f"Classification cache: {len(classified)} new tender texts classified, {cache.size()} cached")
+    print(normalization_cache_report(normalization_usage))
+    return dfs
+
+def verify_engines(csvs: list) -> bool:
+    """
+    Classifies every monthly csv with both engines and reports the months where the
+    vectorized columns differ from the row-wise ones.
+    """
+    mismatched = []
+    for csv in sorted(csvs):
+        input_df = read_monthly_tenders(csv)
+        rowwise_df = classify_rowwise(input_df.copy())
+        vectorized_df = classify_vectorized(input_df.copy())
+        try:
+            # dtypes are left out: newer pandas infers a string dtype for the row-wise lists
+            pd.testing.assert_frame_equal(rowwise_df, vectorized_df, check_dtype=False)
+        except AssertionError as error:
+            mismatched.append(csv)
+            print(f"{os.path.basename(csv)}: engines differ\n{error}")
+    print(f"Engines agree on {len(csvs) - len(mismatched)} of {len(csvs)} monthly csvs")
+    print(normalization_cache_report())
+    return not mismatched
+
+def concatenate_monthly_outputs(dfs: list, combined_path: str, index_path: str):
+    if dfs:
+        idea_frm_tenders_df = pd.concat(dfs, ignore_index=True)
+        before_dedup = idea_frm_tenders_df.shape[0]
+        idea_frm_tenders_df = drop_cross_month_duplicates(idea_frm_tenders_df, index_path)
+        print('Tenders dropped as copies from other months: ', before_dedup - idea_frm_tenders_df.shape[0])
+        idea_frm_tenders_df.to_csv(combined_path, index=False)
+        print('Total MCH-broad tenders across all months: ', idea_frm_tenders_df.shape[0])
+    else:
+        print('No MCH-broad tenders found to aggregate.')
 
 # -----------------------------
-# Concatenate monthly outputs
+# Streaming mode
 # -----------------------------
-data_path_root = os.path.join(os.getcwd(), 'Assam_MCH_analysis', 'TENDERS', 'data')
-csvs = glob.glob(os.path.join(data_path_root, 'mch_tenders', '*.csv'))
-dfs = []
-for csv in csvs:
-    csv_norm = csv.replace("//", "/").replace("\\", "/")
-    month = csv_norm.split(r'/')[-1][:7]
-    df = pd.read_csv(csv_norm)
-    df['month'] = month
-    dfs.append(df)
-
-if dfs:
-    idea_frm_tenders_df = pd.concat(dfs, ignore_index=True)
-    idea_frm_tenders_df.to_csv(os.path.join(data_path_root, 'mch_tenders_all.csv'), index=False)
-    print('Total MCH-broad tenders across all months: ', idea_frm_tenders_df.shape[0])
-else:
-    print('No MCH-broad tenders found to aggregate.')
+
+STREAM_CHUNK_SIZE = 50000
+
+# How the portal writes Published Date, eg: 24-Jul-2020 04:00 PM
+PUBLISHED_DATE_FORMAT = "%d-%b-%Y %I:%M %p"
+
+def published_months(dates: pd.Series) -> pd.Series:
+    """
+    "YYYY_MM" of every Published Date, "undated" where it is missing or does not parse.
+    """
+    parsed = pd.to_datetime(dates, format=PUBLISHED_DATE_FORMAT, errors="coerce")
+    retry = parsed.isna() & dates.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(dates[retry], format="mixed", dayfirst=True, errors="coerce")
+    return parsed.dt.strftime("%Y_%m").fillna("undated")
+
+# Columns the engines add, in their order
+CLASSIFICATION_COLUMNS = ['is_mch_strict', 'positive_keywords_dict', 'negative_keywords_dict', 'Scheme', 'is_awarded', 'is_mch_broad']
+
+def file_month(csv: str) -> str:
+    """
+    "YYYY_MM" of a monthly csv (YYYY_MM_tenders.csv), None for any other csv
+    """
+    filename = os.path.basename(csv)
+    return filename[:7] if re.match(r"\d{4}_\d{2}_tenders\.csv$", filename) else None
+
+def read_header(csv: str) -> list:
+    return list(pd.read_csv(csv, nrows=0).columns)
+
+def union_columns(column_lists) -> list:
+    """
+    Every column of the lists, in the order they first appear, like pd.concat puts them
+    """
+    return list(dict.fromkeys(column for columns in column_lists for column in columns))
+
+def stream_chunks(csvs: list, chunk_size: int):
+    """
+    Yields (chunk, months, columns) of the csvs read chunk_size rows at a time, in sorted
+    order, with the month of every row and the columns of the month files it goes to.
+    A monthly csv (YYYY_MM_tenders.csv) is all of its month and its month file has its columns.
+    The rows of any other csv (a consolidated file of many months) go to the month of their
+    Published Date, and those month files have the columns of all the consolidated csvs.
+    """
+    consolidated_columns = union_columns(read_header(csv) for csv in sorted(csvs) if file_month(csv) is None)
+    for csv in sorted(csvs):
+        month = file_month(csv)
+        columns = read_header(csv) if month is not None else consolidated_columns
+        for chunk in pd.read_csv(csv, chunksize=chunk_size):
+            if month is not None:
+                months = pd.Series(month, index=chunk.index)
+            elif 'Published Date' in chunk.columns:
+                months = published_months(chunk['Published Date'])
+            else:
+                months = pd.Series("undated", index=chunk.index)
+            yield chunk, months, columns
+
+def stream_columns(csvs: list) -> list:
+    """
+    Columns the combined file of a stream over the csvs is written with: every input column
+    and the classification columns. classify_stream puts them in the batch mode's order at the end.
+    """
+    return union_columns(read_header(csv) + CLASSIFICATION_COLUMNS + ['month'] for csv in sorted(csvs))
+
+def reorder_csv(path: str, columns: list, chunk_size: int = STREAM_CHUNK_SIZE):
+    """
+    Rewrites the csv at path with only columns, in their order, chunk_size rows at a time.
+    Values are copied as text.
+    """
+    reordered_path = path + '.reordered'
+    chunks = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_size)
+    for index, chunk in enumerate(chunks):
+        chunk[columns].to_csv(reordered_path, mode='w' if index == 0 else 'a', header=index == 0, encoding='utf-8', index=False)
+    os.replace(reordered_path, path)
+
+def append_csv(frame: pd.DataFrame, path: str, headers: dict, columns: list):
+    """
+    Appends frame to path under columns, starting the file with them on its first write in
+    this run. Columns of the frame missing from them are an error, never dropped.
+    """
+    extra_columns = [column for column in frame.columns if column not in columns]
+    if extra_columns:
+        raise ValueError(f"Columns {extra_columns} are not in the header of {path}")
+    if path not in headers:
+        headers[path] = columns
+        frame.reindex(columns=columns).to_csv(path, encoding='utf-8', index=False)
+    else:
+        frame.reindex(columns=headers[path]).to_csv(path, mode='a', header=False, encoding='utf-8', index=False)
+
+def classify_stream(chunks, engine: str, out_dir: str, combined_path: str, combined_columns: list,
+                    cache: ClassificationCache = None, kept_months: dict = None):
+    """
+    Classifies the chunks one at a time and appends their MCH-broad tenders to the month's
+    file in out_dir and to the combined file, so memory stays at one chunk plus the Tender
+    IDs read. A Tender ID is read once per month: its later rows in the month are dropped,
+    like drop_duplicates does within a month file. A tender is written once to the combined
+    file: its copy from the month in kept_months, else the first copy (the batch mode keeps
+    the latest). The combined file's columns end up in the batch mode's order: those of the
+    months with MCH-broad tenders, in month order. The files are written next to their paths
+    and replace them at the end, the month files of earlier runs for the months read that this
+    one did not write are removed.
+    """
+    headers = {}
+    counts = {}
+    months_read = set()
+    broad_month_columns = {}
+    month_ids = set()
+    combined_ids = set()
+    dropped = 0
+    combined_temporary = combined_path + '.tmp'
+    for chunk, months, columns in chunks:
+        months_read.update(months)
+        chunk = clean_tenders(chunk)
+        months = months.loc[chunk.index]
+        if 'Tender ID' in chunk.columns:
+            # drop_duplicates of clean_tenders only sees this chunk
+            keys = list(zip(months, chunk['Tender ID']))
+            first = []
+            for key in keys:
+                first.append(pd.isna(key[1]) or key not in month_ids)
+                month_ids.add(key)
+            chunk = chunk[first]
+            months = months[first]
+        if chunk.shape[0] == 0:
+            continue
+        if cache is None:
+            chunk = ENGINES[engine](chunk)
+        else:
+            chunk, new_results = classify_cached(chunk, engine, cache)
+            cache.store(new_results)
+        idea_mch_df = mch_broad_tenders(chunk)
+
+        strict_counts = (chunk['is_mch_strict'] == 'True').groupby(months).sum()
+        for month, strict_count in strict_counts.items():
+            counts.setdefault(month, [0, 0, 0])[0] += strict_count
+        for month, month_df in idea_mch_df.groupby(months.loc[idea_mch_df.index], sort=True):
+            counts[month][1] += month_df.shape[0]
+            counts[month][2] += month_df['is_awarded'].sum()
+            append_csv(month_df, os.path.join(out_dir, f"{month}_tenders.csv.tmp"), headers, columns + CLASSIFICATION_COLUMNS)
+            broad_month_columns[month] = columns + CLASSIFICATION_COLUMNS + ['month']
+
+            combined = month_df.assign(month=month)
+            if kept_months is not None:
+                combined = combined[combined['Tender ID'].map(kept_months).fillna(month) == month]
+            combined = combined[~combined['Tender ID'].isin(combined_ids)].drop_duplicates(subset=['Tender ID'])
+            dropped += month_df.shape[0] - combined.shape[0]
+            combined_ids.update(combined['Tender ID'])
+            append_csv(combined, combined_temporary, headers, combined_columns)
+
+    for month in sorted(counts):
+        strict_count, broad_count, awarded_count = counts[month]
+        print(f"{month}_tenders.csv: strict={strict_count}, broad={broad_count}, awarded_broad={awarded_count}")
+    if combined_temporary in headers:
+        # pd.concat of the batch mode only sees the columns of the months with MCH-broad tenders
+        batch_columns = union_columns(broad_month_columns[month] for month in sorted(broad_month_columns))
+        if batch_columns != headers[combined_temporary]:
+            reorder_csv(combined_temporary, batch_columns)
+    for temporary_path in headers:
+        os.replace(temporary_path, temporary_path[:-len('.tmp')])
+    written = set(headers)
+    for month in months_read:
+        month_path = os.path.join(out_dir, f"{month}_tenders.csv")
+        if os.path.exists(month_path) and month_path + '.tmp' not in written:
+            os.remove(month_path)
+    if combined_ids:
+        print('Tenders dropped as copies from other months: ', dropped)
+        print('Total MCH-broad tenders across all months: ', len(combined_ids))
+    else:
+        print('No MCH-broad tenders found to aggregate.')
+
+def read_mch_tenders(csv: str) -> pd.DataFrame:
+    """
+    Reads an output of this script (a month of data/mch_tenders or mch_tenders_all.csv) with
+    the hit count of every keyword of POSITIVE_KEYWORDS and NEGATIVE_KEYWORDS as an integer
+    column kw_<keyword>
+    """
+    df = pd.read_csv(csv)
+    for column, keywords in (('positive_keywords_dict', POSITIVE_KEYWORDS), ('negative_keywords_dict', NEGATIVE_KEYWORDS)):
+        if column in df.columns:
+            df = df.join(read_keyword_hits(df[column], keywords).add_prefix('kw_'))
+    return df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tags the MCH tenders of data/monthly_tenders into data/mch_tenders and mch_tenders_all.csv")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="vectorized",
+                        help="vectorized classifies column by column, rowwise one row at a time with DataFrame.apply")
+    parser.add_argument("--verify", action="store_true",
+                        help="only check that both engines give the same columns on every monthly csv")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(),
+                        help="worker processes classifying the monthly csvs, 1 classifies them in this process")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="classify every tender again instead of reusing the results in data/" + CACHE_NAME)
+    parser.add_argument("--stream", action="store_true",
+                        help="read the csvs in chunks of --chunk-size rows in this process and append the MCH-broad tenders "
+                             "to the outputs chunk by chunk, for inputs larger than memory")
+    parser.add_argument("--chunk-size", type=int, default=STREAM_CHUNK_SIZE, help="rows per chunk of --stream")
+    parser.add_argument("--input", nargs="+",
+                        help="consolidated csvs to stream instead of data/monthly_tenders, their rows go to the month "
+                             "of their Published Date. Implies --stream")
+    args = parser.parse_args()
+
+    # written before the worker processes start, so they unpickle the rules instead of compiling them
+    save_rules(RULES)
+
+    csvs = args.input or glob.glob(data_path + '*.csv')
+    print('Total CSVs to process: ', len(csvs))
+
+    if args.verify:
+        sys.exit(0 if verify_engines(csvs) else 1)
+
+    out_dir = os.path.join(os.getcwd(), 'Assam_MCH_analysis', 'TENDERS', 'data', 'mch_tenders')
+    os.makedirs(out_dir, exist_ok=True)
+
+    cache = None
+    cache_path = None
+    if not args.no_cache:
+        cache_path = os.path.join(os.getcwd(), 'Assam_MCH_analysis', 'TENDERS', 'data', CACHE_NAME)
+        cache = ClassificationCache(cache_path, RULES_FINGERPRINT)
+        # results of earlier rules can never be hit again
+        cache.drop_other_rules()
+
+    if args.stream or args.input:
+        # the months of tender_index.json are the monthly csvs', not the Published Date months of --input
+        kept_months = None if args.input else read_kept_months(os.path.join(data_path, 'tender_index.json'))
+        classify_stream(stream_chunks(csvs, args.chunk_size), args.engine, out_dir,
+                        os.path.join(os.getcwd(), 'Assam_MCH_analysis', 'TENDERS', 'data', 'mch_tenders_all.csv'),
+                        stream_columns(csvs), cache, kept_months)
+        if cache is not None:
+            cache.close()
+        print(normalization_cache_report())
+        sys.exit(0)
+
+    # Months are classified in the pool and written here in file name order, the combined
+    # file is built from the same frames instead of reading the monthly outputs back
+    dfs = write_monthly_outputs(classify_months(csvs, args.engine, args.processes, cache_path), out_dir, cache)
+    if cache is not None:
+        cache.close()
+
+    # -----------------------------
+    # Concatenate monthly outputs
+    # -----------------------------
+    concatenate_monthly_outputs(dfs, os.path.join(os.getcwd(), 'Assam_MCH_analysis', 'TENDERS', 'data', 'mch_tenders_all.csv'),
+                                os.path.join(data_path, 'tender_index.json'))
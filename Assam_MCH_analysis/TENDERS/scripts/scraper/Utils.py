@@ -1,11 +1,13 @@
 import pandas as pd
 from logging.config import fileConfig
 import os
+import requests
 from requests.adapters import HTTPAdapter
 import csv
+import io
 import glob
 from selenium import webdriver
-from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import NoSuchElementException, NoSuchWindowException, StaleElementReferenceException, TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select
 from selenium.webdriver.support.ui import WebDriverWait
@@ -15,6 +17,8 @@ from urllib3.util import Retry
 import time
 import pdb
 import re
+from lxml import html as lxml_html
+from urllib.parse import urljoin
 
 def sanitize_filename(filename):
     # Remove invalid characters: \ / : * ? " < > | (on Windows)
@@ -25,6 +29,20 @@ def sanitize_filename(filename):
 
 MAX_RELOADS = 3
 SLEEP_TIME = 5
+WAIT_TIMEOUT = 30
+WAIT_BACKOFF_START = 0.1
+WAIT_BACKOFF_MAX = 2
+
+class ScrapeTimeout(Exception):
+    '''
+    A window or table of a tender did not show up in time, the tender should be retried later
+    '''
+    pass
+
+# errors after which a tender is retried later: a window, table or element did not show up in
+# time (ScrapeTimeout, or selenium's TimeoutException from a wait or a page load), or a request failed
+RETRYABLE_ERRORS = (ScrapeTimeout, TimeoutException, requests.exceptions.RequestException)
+
 class SeleniumScrappingUtils(object):
     def __init__(self):
         pass
@@ -61,40 +79,83 @@ class SeleniumScrappingUtils(object):
         ''' Extracts name from webelement'''
         name_of_element = [element[i].text for i in range(len(element))]
         return name_of_element
-    def extract_vertical_table(table_section,name_of_file,skip_header_number = None):
+    def extract_vertical_records(table_section,skip_header_number = None):
+        '''
+        Extracts vertical tables, returns the rows of the table
         '''
-        Extracts vertical tables
+        records = []
+        for row in table_section.find_elements(By.CSS_SELECTOR,'tr')[skip_header_number:]:
+            records.append([d.text for d in row.find_elements(By.CSS_SELECTOR,'td')])
+        return records
+    def extract_horizontal_records(table_section,skip_header_number = None):
         '''
+        Extracts horizontal tables, returns the rows of the table
+        '''
+        records = []
+        for row in table_section.find_elements(By.CSS_SELECTOR,"tbody"):
+            try:
+                 records.append([d.text for d in row.find_elements(By.CSS_SELECTOR,'td:nth-of-type(2n+1)')[skip_header_number:]])
+            except Exception as e:
+                #pdb.set_trace()
+                print(f"Error processing row: {e}")
+                continue
+            records.append([d.text for d in row.find_elements(By.CSS_SELECTOR,'td:nth-of-type(2n+2)')])
+        return records
+
+    def write_records(records, name_of_file):
         with open(str(name_of_file)+".csv", 'w', newline='', encoding="utf-8") as csvfile:
-            wr = csv.writer(csvfile)
-            for row in table_section.find_elements(By.CSS_SELECTOR,'tr')[skip_header_number:]:
-                wr.writerow([d.text for d in row.find_elements(By.CSS_SELECTOR,'td')])
+            csv.writer(csvfile).writerows(records)
+
+    def extract_vertical_table(table_section,name_of_file,skip_header_number = None):
+        '''
+        Extracts vertical tables to <name_of_file>.csv
+        '''
+        SeleniumScrappingUtils.write_records(SeleniumScrappingUtils.extract_vertical_records(table_section,skip_header_number), name_of_file)
     def extract_horizontal_table(table_section,name_of_file,skip_header_number = None):
         '''
-        Extracts horizontal tables
+        Extracts horizontal tables to <name_of_file>.csv, the name sanitized
+        '''
+        SeleniumScrappingUtils.write_records(SeleniumScrappingUtils.extract_horizontal_records(table_section,skip_header_number), sanitize_filename(name_of_file))
+
+    def records_to_frame(records):
+        '''
+        Reads the rows of a table section the way pandas reads a csv: the first row is the
+        header, duplicated headers get a .1, .2 suffix. Returns None for an empty section
         '''
-        sanitized_name_of_file = sanitize_filename(name_of_file)
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(records)
+        buffer.seek(0)
+        try:
+            return pd.read_csv(buffer)
+        except pd.errors.EmptyDataError:
+            return None
 
-        with open(str(sanitized_name_of_file) + ".csv", 'w', newline='', encoding="utf-8") as csvfile:
-            wr = csv.writer(csvfile)
-            for row in table_section.find_elements(By.CSS_SELECTOR,"tbody"):
-                try:
-                     wr.writerow([d.text for d in row.find_elements(By.CSS_SELECTOR,'td:nth-of-type(2n+1)')[skip_header_number:]])
-                except Exception as e:
-                    #pdb.set_trace()    
-                    print(f"Error processing row: {e}")
-                    continue
-                wr.writerow([d.text for d in row.find_elements(By.CSS_SELECTOR,'td:nth-of-type(2n+2)')])
-                
-            
-            
-                
-    def concatinate_csvs(path_to_save,name_of_file, tender_status):
+    def concatinate_frames(frames, tender_status):
         '''
-        combines all the csvs
+        combines the section frames side by side, like concatinate_csvs
+        '''
+        combined_frame = pd.concat(frames, axis = 1)
+        combined_frame['Tender Stage'] = tender_status
+        return combined_frame
+
+    def get_page_document(browser):
+        '''
+        Fetches the whole page in one WebDriver call and parses it with lxml
+        '''
+        return HtmlScrappingUtils.parse_html(browser.page_source)
+
+    def reread_frame(frame):
+        '''
+        Gives the frame the headers and dtypes it would have after being saved to csv and read back
+        '''
+        return pd.read_csv(io.StringIO(frame.to_csv(index=False)))
+
+    def concatinate_csvs(path_to_save,name_of_file, tender_status, directory = '.'):
+        '''
+        combines all the csvs present in the directory
         '''
         extension = 'csv'
-        all_filenames = [i for i in glob.glob('*.{}'.format(extension))]
+        all_filenames = [i for i in glob.glob(os.path.join(directory,'*.{}'.format(extension)))]
         combined_csv = pd.concat([pd.read_csv(f) for f in all_filenames ], axis = 1)
         combined_csv['Tender Stage'] = tender_status
         combined_csv.to_csv(path_to_save + name_of_file+".csv", index=False, encoding='utf-8-sig')
@@ -121,6 +182,177 @@ class SeleniumScrappingUtils(object):
             print("File found")
             return True
     
+    def wait_until(condition, description, timeout = WAIT_TIMEOUT):
+        '''
+        Calls condition until it returns something truthy and returns that, sleeping a little
+        longer after every miss. Raises ScrapeTimeout after timeout seconds
+        '''
+        delay = WAIT_BACKOFF_START
+        end_time = time.monotonic() + timeout
+        while True:
+            try:
+                result = condition()
+                if result:
+                    return result
+            except (NoSuchElementException, NoSuchWindowException, StaleElementReferenceException):
+                pass
+            remaining = end_time - time.monotonic()
+            if remaining <= 0:
+                raise ScrapeTimeout("Timed out after {}s waiting for {}".format(timeout, description))
+            time.sleep(min(delay, remaining))
+            delay = min(delay*2, WAIT_BACKOFF_MAX)
+
+    def switch_to_new_window(browser, handles_before, timeout = WAIT_TIMEOUT):
+        '''
+        Waits for a window that is not in handles_before (the handles from before the click
+        that opens it) and switches to it
+        '''
+        new_handles = SeleniumScrappingUtils.wait_until(
+            lambda: [handle for handle in browser.window_handles if handle not in handles_before],
+            "a new window", timeout)
+        browser.switch_to.window(new_handles[0])
+        return new_handles[0]
+
+    def wait_for_elements(browser, by, value, timeout = WAIT_TIMEOUT):
+        '''
+        Waits until at least one element matches and returns all the matches
+        '''
+        return SeleniumScrappingUtils.wait_until(lambda: browser.find_elements(by, value),
+                                                 "{} {}".format(by, value), timeout)
+
+    def return_to_window(browser, main_window):
+        '''
+        Closes every window other than main_window and switches back to it
+        '''
+        for handle in browser.window_handles:
+            if handle != main_window:
+                browser.switch_to.window(handle)
+                browser.close()
+        browser.switch_to.window(main_window)
+
     def select_drop_down(browser,id,value):
          selected_element = Select(browser.find_element("xpath",id))
-         selected_element.select_by_value(value)
\ No newline at end of file
+         selected_element.select_by_value(value)
+
+
+BLOCK_TAGS = {"address","blockquote","div","form","h1","h2","h3","h4","h5","h6","li","ol","p","pre",
+              "table","tbody","thead","tfoot","tr","ul"}
+REQUEST_TIMEOUT = 30
+ODD_CELLS_XPATH = ".//td[count(preceding-sibling::td) mod 2 = 0]"
+EVEN_CELLS_XPATH = ".//td[count(preceding-sibling::td) mod 2 = 1]"
+class HtmlScrappingUtils(object):
+    '''
+    Counterparts of SeleniumScrappingUtils for pages fetched with requests and parsed with lxml
+    '''
+    def __init__(self):
+        pass
+
+    def get_requests_session(cookies, user_agent, pool_size=10):
+        '''
+        Builds a keep-alive session carrying the cookies of a browser that already passed the captcha
+        '''
+        session = requests.Session()
+        retries = Retry(total=MAX_RELOADS, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["User-Agent"] = user_agent
+        for cookie in cookies:
+            session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain"), path=cookie.get("path", "/"))
+        return session
+
+    def parse_html(page_source):
+        '''
+        Parses a page and adds the tbody the browser would insert around bare rows,
+        so the xpaths copied from the browser work on it
+        '''
+        document = lxml_html.fromstring(page_source)
+        for element in document.xpath("//script|//style"):
+            element.drop_tree()
+        for table in document.iter("table"):
+            rows = [child for child in table if child.tag == "tr"]
+            if rows:
+                tbody = lxml_html.Element("tbody")
+                table.insert(table.index(rows[0]), tbody)
+                for row in rows:
+                    tbody.append(row)
+        return document
+
+    def get_html_page(session, link):
+        '''
+        Fetches a page with the session and returns the parsed document
+        '''
+        response = session.get(link, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return HtmlScrappingUtils.parse_html(response.text)
+
+    def get_link(document, base_link, element_id):
+        '''
+        Absolute href of the anchor with the given id
+        '''
+        hrefs = document.xpath('//a[@id="{}"]/@href'.format(element_id))
+        if not hrefs or hrefs[0].startswith("javascript"):
+            raise ValueError("No link with id {} on {}".format(element_id, base_link))
+        return urljoin(base_link, hrefs[0])
+
+    def find_elements_by_class(element, class_name):
+        '''
+        Descendants of element having class_name, like By.CLASS_NAME
+        '''
+        return element.xpath(".//*[contains(concat(' ', normalize-space(@class), ' '), ' {} ')]".format(class_name))
+
+    def get_text_from_element(element):
+        '''
+        Text of an element as selenium reports it: a line per <br> or block element,
+        whitespace collapsed within lines
+        '''
+        parts = []
+        def collect_text(node):
+            is_block = node.tag in BLOCK_TAGS
+            if is_block or node.tag == "br":
+                parts.append("\n")
+            if node.text:
+                parts.append(node.text)
+            for child in node:
+                if isinstance(child.tag, str):
+                    collect_text(child)
+                if child.tail:
+                    parts.append(child.tail)
+            if is_block:
+                parts.append("\n")
+        collect_text(element)
+        lines = [" ".join(line.split()) for line in "".join(parts).split("\n")]
+        return "\n".join(line for line in lines if line)
+
+    def extract_vertical_records(table_section,skip_header_number = None):
+        '''
+        Extracts vertical tables, returns the rows of the table
+        '''
+        return [[HtmlScrappingUtils.get_text_from_element(d) for d in row.xpath(".//td")]
+                for row in table_section.xpath(".//tr")[skip_header_number:]]
+
+    def extract_horizontal_records(table_section,skip_header_number = None):
+        '''
+        Extracts horizontal tables, the odd cells are the header and the even cells the values
+        '''
+        records = []
+        for row in table_section.xpath(".//tbody"):
+            records.append([HtmlScrappingUtils.get_text_from_element(d) for d in row.xpath(ODD_CELLS_XPATH)[skip_header_number:]])
+            records.append([HtmlScrappingUtils.get_text_from_element(d) for d in row.xpath(EVEN_CELLS_XPATH)])
+        return records
+
+    def vertical_table_round_trips(table_section,skip_header_number = None):
+        '''
+        Number of WebDriver calls SeleniumScrappingUtils.extract_vertical_records makes on the same table
+        '''
+        rows = table_section.xpath(".//tr")[skip_header_number:]
+        return 1 + sum(1 + len(row.xpath(".//td")) for row in rows)
+
+    def horizontal_table_round_trips(table_section,skip_header_number = None):
+        '''
+        Number of WebDriver calls SeleniumScrappingUtils.extract_horizontal_records makes on the same table
+        '''
+        round_trips = 1
+        for row in table_section.xpath(".//tbody"):
+            round_trips += 2 + len(row.xpath(ODD_CELLS_XPATH)[skip_header_number:]) + len(row.xpath(EVEN_CELLS_XPATH))
+        return round_trips
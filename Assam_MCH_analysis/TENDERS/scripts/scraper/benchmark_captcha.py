@@ -0,0 +1,42 @@
+# Measures how fast and how well captcha.py solves a folder of saved captcha images
+# The name of every image (without .png) is the text of its captcha
+import argparse
+import glob
+import os
+import statistics
+import time
+from captcha import solve_captcha_image
+
+def benchmark(folder):
+    '''
+    Solves every png in the folder, returns (label, answer, seconds) for each
+    '''
+    results = []
+    for path in sorted(glob.glob(os.path.join(folder,"*.png"))):
+        label = os.path.splitext(os.path.basename(path))[0]
+        with open(path,"rb") as image_file:
+            png_bytes = image_file.read()
+        start = time.perf_counter()
+        answer = solve_captcha_image(png_bytes)
+        results.append((label,answer,time.perf_counter()-start))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the captcha solver on saved captcha images")
+    parser.add_argument("folder",help="folder of <captcha text>.png images")
+    parser.add_argument("--show-misses",action="store_true",help="print the images solved wrongly")
+    args = parser.parse_args()
+
+    results = benchmark(args.folder)
+    if not results:
+        raise SystemExit("No png images in {}".format(args.folder))
+    latencies = sorted(seconds*1000 for label,answer,seconds in results)
+    solved = sum(label == answer for label,answer,seconds in results)
+    if args.show_misses:
+        for label,answer,seconds in results:
+            if label != answer:
+                print("{} read as {}".format(label,answer))
+    print("Images:   {}".format(len(results)))
+    print("Accuracy: {:.1%} ({} solved)".format(solved/len(results),solved))
+    print("Latency:  mean {:.1f} ms, median {:.1f} ms, p95 {:.1f} ms".format(
+        statistics.mean(latencies),statistics.median(latencies),latencies[int(0.95*(len(latencies)-1))]))
@@ -0,0 +1,94 @@
+# Runs the scraper against replay_portal.py and reports tenders per minute, so scraping
+# modes can be compared on the same pages without touching assamtenders.gov.in
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+from selenium import webdriver
+import scraper_assam_recent_tenders_tender_status as scraper
+from checkpoint import ScrapeCheckpoint
+from metrics import ScraperMetrics
+from replay_portal import ReplayPortal
+from run_scraper import parse_month
+
+REPLAY_CAPTCHA_ANSWER = "replay"
+
+def replay_captcha(browser,captcha_image_xpath):
+    '''
+    Stands in for reading the captcha with tesseract, the replay portal takes any answer
+    '''
+    return REPLAY_CAPTCHA_ANSWER
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the scraper on pages recorded with --record-dir")
+    parser.add_argument("record_dir")
+    parser.add_argument("--latency",type=float,default=0.2,help="seconds the replay portal waits before every response")
+    parser.add_argument("--pages",type=int,help="listing pages to serve, the recording is repeated to fill them")
+    parser.add_argument("--no-captcha",action="store_true")
+    parser.add_argument("--captcha-rejects",type=int,default=0,help="captcha answers the portal rejects before accepting one")
+    parser.add_argument("--month",type=parse_month,default=(2023,6),help="month searched first (YYYY-MM), every search after it is for the next month")
+    parser.add_argument("--searches",type=int,default=1,help="times the listing is searched and scraped")
+    parser.add_argument("--reuse-session",action="store_true",help="keep one browser open for all the searches")
+    parser.add_argument("--workers",type=int,default=1)
+    parser.add_argument("--http-details",action="store_true")
+    parser.add_argument("--bulk-dom",action="store_true")
+    parser.add_argument("--sink",choices=["sqlite","csv"],default="sqlite")
+    parser.add_argument("--keep-output",action="store_true",help="keep the scraped csvs and metrics")
+    args = parser.parse_args()
+
+    portal = ReplayPortal(("127.0.0.1",0),args.record_dir,args.latency,args.pages,not args.no_captcha,args.captcha_rejects)
+    threading.Thread(target=portal.serve_forever,daemon=True).start()
+    base_url = "http://127.0.0.1:{}/".format(portal.server_port)
+    # worker browsers open the search page before taking the cookies
+    scraper.url = base_url
+    scraper.captcha = replay_captcha
+    output = tempfile.mkdtemp(prefix="replay_benchmark_")
+
+    browser = None
+    all_metrics = []
+    start = time.perf_counter()
+    year,month = args.month
+    try:
+        for search in range(args.searches):
+            folder = os.path.join(output,"search_{}".format(search))
+            os.makedirs(folder)
+            metrics = ScraperMetrics("replay_search_{}".format(search))
+            all_metrics.append(metrics)
+            if browser is None:
+                browser = webdriver.Firefox(service=scraper.service, options=scraper.firefox_options)
+                metrics.count("browser_launches")
+            metrics.instrument_browser(browser)
+            scraper.search_tenders(browser,'6',year,month,"ocr",metrics)
+            scraper.scrape_tender_status(browser,folder,'6',ScrapeCheckpoint(folder,'6'),args,metrics)
+            metrics.save(os.path.join(folder,"metrics_6"))
+            year,month = (year+1,1) if month == 12 else (year,month+1)
+            if not args.reuse_session:
+                browser.quit()
+                browser = None
+    finally:
+        if browser is not None:
+            browser.quit()
+        portal.shutdown()
+    wall_time = time.perf_counter() - start
+
+    tenders = sum(metrics.events["tenders_scraped"] for metrics in all_metrics)
+    webdriver_calls = sum(sum(metrics.webdriver_calls.values()) for metrics in all_metrics)
+    print("Listing pages served per search: {}, latency {}s".format(portal.pages,args.latency))
+    print("Tenders scraped: {} in {:.1f}s".format(tenders,wall_time))
+    print("Tenders per minute: {:.1f}".format(tenders/wall_time*60))
+    print("WebDriver calls per tender: {:.1f}".format(webdriver_calls/tenders if tenders else 0))
+    print("WebDriver round-trips saved by --bulk-dom: {}".format(sum(metrics.events["webdriver_round_trips_saved"] for metrics in all_metrics)))
+    print("Searches: {}, browser launches: {}, captchas solved: {}, captcha attempts: {}".format(
+        len(portal.searches),
+        sum(metrics.events["browser_launches"] for metrics in all_metrics),
+        sum(metrics.events["captchas_solved"] for metrics in all_metrics),
+        sum(metrics.events["captcha_attempts"] for metrics in all_metrics)))
+    for stage in ["search_form","captcha","listing","tender_page","detail","stage_summary","write"]:
+        total = sum(metrics.stage_totals[stage]["total_s"] for metrics in all_metrics if stage in metrics.stage_totals)
+        print("  {:<14} {:8.1f}s".format(stage,total))
+    if args.keep_output:
+        print("Output kept in {}".format(output))
+    else:
+        shutil.rmtree(output)
@@ -1,46 +1,38 @@
 from Utils import SeleniumScrappingUtils
 from PIL import Image, ImageFilter
-from pytesseract import image_to_string 
+from pytesseract import image_to_string
+import io
 import numpy
-from scipy.ndimage.filters import gaussian_filter
-import os
+from scipy.ndimage import gaussian_filter
 from selenium.webdriver.common.by import By
 
 #pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
 th1 = 140
-th2 = 140 # threshold after blurring 
-sig = 1.5 
-
-def captcha(browser,captcha_image_xpath):
-    captcha_image_element = SeleniumScrappingUtils.get_page_element(browser,captcha_image_xpath)
-    SeleniumScrappingUtils.save_image_as_png(captcha_image_element)
-    original = Image.open('captcha_image.png')
-    original.save("original.png")
-    black_and_white =original.convert("L") 
-    black_and_white.save("black_and_white.png")
-
-    first_threshold = black_and_white.point(lambda p: p > th1 and 255)
-    first_threshold.save("first_threshold.png")
-
-
-    blur=numpy.array(first_threshold) #create an image array
-    blurred = gaussian_filter(blur, sigma=sig)
-    blurred = Image.fromarray(blurred)
-    blurred.save("blurred.png")
-
-    final = blurred.point(lambda p: p > th2 and 255)
+th2 = 140 # threshold after blurring
+sig = 1.5
+config = ("-l eng --oem 3 --psm 11")
+
+def preprocess_captcha(original):
+    '''
+    grayscale -> threshold -> gaussian blur -> threshold -> sharpen, on arrays in memory
+    '''
+    black_and_white = numpy.asarray(original.convert("L"))
+    first_threshold = numpy.where(black_and_white > th1, 255, 0).astype(numpy.uint8)
+    blurred = gaussian_filter(first_threshold, sigma=sig)
+    final = Image.fromarray(numpy.where(blurred > th2, 255, 0).astype(numpy.uint8))
     final = final.filter(ImageFilter.EDGE_ENHANCE_MORE)
     final = final.filter(ImageFilter.SHARPEN)
-    final.save("final.png")
-
-    #         remove images 
-    os.remove("black_and_white.png")
-    os.remove("first_threshold.png")
-    os.remove("blurred.png")
-    os.remove("original.png")
+    return final
 
+def solve_captcha_image(png_bytes):
+    '''
+    Reads the text of a captcha image given as png bytes
+    '''
+    final = preprocess_captcha(Image.open(io.BytesIO(png_bytes)))
+    captcha_text = image_to_string(final, lang = "eng",config=config)
+    return "".join(captcha_text.split())
 
-    config = ("-l eng --oem 3 --psm 11")
-    captcha_text = image_to_string(Image.open('final.png'), lang = "eng",config=config)
-    return captcha_text
+def captcha(browser,captcha_image_xpath):
+    captcha_image_element = SeleniumScrappingUtils.get_page_element(browser,captcha_image_xpath)
+    return solve_captcha_image(captcha_image_element.screenshot_as_png)
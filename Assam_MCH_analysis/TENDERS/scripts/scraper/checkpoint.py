@@ -0,0 +1,89 @@
+# Checkpoint manifest of a scraping run, lets an interrupted month resume where it stopped
+import csv
+import glob
+import json
+import os
+import threading
+from tender_store import TenderStore
+from tender_schema import TENDER_STATUS_STAGES
+
+def tender_file_stage(path):
+    '''
+    The Tender Stage of a final_<tender id>.csv, None if it has none
+    '''
+    with open(path, encoding='utf-8-sig', newline='') as tender_file:
+        reader = csv.reader(tender_file)
+        header = next(reader, [])
+        row = next(reader, [])
+    if 'Tender Stage' not in header or header.index('Tender Stage') >= len(row):
+        return None
+    return row[header.index('Tender Stage')]
+
+class ScrapeCheckpoint(object):
+    '''
+    Records the tenders scraped for one month and tender status, and the first listing
+    page not fully scraped (page_index, and next_page_link which loads it).
+    Saved to <folder>/checkpoint_<tender_status_id>.json after every change.
+    With rescrape the saved manifest and the tenders already in the folder are ignored, the month
+    is scraped again from its first page and its tenders overwritten.
+    '''
+    def __init__(self, folder, tender_status_id, rescrape=False):
+        self.path = os.path.join(folder, "checkpoint_{}.json".format(tender_status_id))
+        self.lock = threading.Lock()
+        self.completed = set()
+        self.page_index = 0
+        self.next_page_link = ''
+        self.pages = {}
+        if rescrape:
+            return
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as manifest:
+                saved = json.load(manifest)
+            self.completed = set(saved["completed"])
+            self.page_index = saved["page_index"]
+            self.next_page_link = saved["next_page_link"]
+        # tenders written before checkpoints existed, or before a crash lost the manifest. Only the
+        # ones saved with this status count: a tender saved at an earlier stage is scraped again
+        tender_stage = TENDER_STATUS_STAGES[tender_status_id]
+        for path in glob.glob(os.path.join(folder, "final_*.csv")):
+            if tender_file_stage(path) == tender_stage:
+                self.completed.add(os.path.basename(path)[len("final_"):-len(".csv")])
+        self.completed.update(TenderStore.stored_tender_ids(folder, tender_stage))
+
+    def is_completed(self, tender_id):
+        with self.lock:
+            return tender_id in self.completed
+
+    def start_page(self, page_index, next_page_link, tender_ids):
+        '''
+        Registers the tenders of a listing page, next_page_link is the link to the page after it
+        '''
+        with self.lock:
+            self.pages[page_index] = {"next_page_link": next_page_link,
+                                      "pending": set(tender_ids) - self.completed}
+            self.advance()
+            self.save()
+
+    def mark_completed(self, tender_id):
+        with self.lock:
+            self.completed.add(tender_id)
+            for page in self.pages.values():
+                page["pending"].discard(tender_id)
+            self.advance()
+            self.save()
+
+    def advance(self):
+        '''
+        Moves the cursor past the pages whose tenders are all scraped
+        '''
+        while self.page_index in self.pages and not self.pages[self.page_index]["pending"]:
+            self.next_page_link = self.pages.pop(self.page_index)["next_page_link"]
+            self.page_index += 1
+
+    def save(self):
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as manifest:
+            json.dump({"completed": sorted(self.completed),
+                       "page_index": self.page_index,
+                       "next_page_link": self.next_page_link}, manifest, indent=1)
+        os.replace(temporary_path, self.path)
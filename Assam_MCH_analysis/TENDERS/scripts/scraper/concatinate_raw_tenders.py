@@ -1,50 +1,152 @@
-import pandas as pd
 import os
 import glob
+import csv
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter
+from tender_store import TenderStore
+from raw_manifest import RawManifest, month_folders
+from tender_index import TenderIndex
+import tender_schema
 
-for year in range(2025,2026):
-    year = str(year)
-    
-    for month in range(7,11):        
-        month=str(month)
-        if int(month)<10:
-            month = '0'+str(month)
-        folder = year+'_'+str(month)
-
-        print(year+'_'+month)
-        path = os.getcwd() + '/Sources/TENDERS/scripts/scraper/scraped_recent_tenders/{}'.format(folder)
-        data_path = os.getcwd() + '/Sources/TENDERS/data/monthly_tenders/'
-
-        csvs = glob.glob(path+'/*.csv')
-        
-        print('Number of tenders: ',len(csvs))
-
-        if len(csvs)==0:
-            continue
-        dfs= []
-        for csv in csvs:
-            df = pd.read_csv(csv)
-            dfs.append(df)
-
-        master_df = pd.concat(dfs)
-        master_df = master_df.dropna(subset=['Tender ID'])
-        #Commented script is to debug columns
-        #master_df.to_csv(r'D:\CivicDataLab_IDS-DRR\IDS-DRR_Github\IDS-DRR-Assam\Sources\TENDERS\scripts\scraper/debug_{}.csv'.format(folder), index=False)
-        try:
-             master_df = master_df[['Tender ID','Tender Reference Number', 'Title', 'Work Description', 'Tender Category', 'Tender Type',
-                            'Form of contract',
-                            'Product Category', 'Is Multi Currency Allowed For BOQ', 'Allow Two Stage Bidding', 'Independent External Monitor/Remarks',
-                            'Publish Date', 'Pre Bid Meeting Date', 'Bid Validity(Days)', 'Should Allow NDA Tender', 'Allow Preferential Bidder',
-                            'Payment Mode', 'Bid Opening Date', 'Organisation Chain', 'Location', 'Pincode','No. of Covers', 'Tender Value in ₹',
-                            'Bidder Name', 'Awarded Value', 'Status', 'Contract Date :']]#, 'Tender Stage']]
-        except:
-            print('Error')
-            continue
-
-        master_df['Department'] = master_df['Organisation Chain']
-        master_df = master_df.rename(columns={'Tender Reference Number':'tender_externalreference',
-                                            'Title': 'tender_title',
-                                            'No. of Covers': 'No of Bids Received',
-                                            'Publish Date': 'Published Date',
-                                            'Location': 'location'})
-        master_df.to_csv(data_path+'{}_tenders.csv'.format(folder), index=False)
\ No newline at end of file
+FILES_PER_TASK = 200
+
+def read_tender_file(path):
+    '''
+    The canonical columns of a final_<tender id>.csv as {column: raw value}, the headers
+    tender_schema does not know and when the file was written. Only the first row is read,
+    the rows after it are the extra rows of multi-row sections and have no Tender ID
+    '''
+    with open(path, encoding='utf-8-sig', newline='') as tender_file:
+        reader = csv.reader(tender_file)
+        header = next(reader, [])
+        row = next(reader, [])
+    positions, unknown_headers = tender_schema.resolve_columns(header)
+    scraped_at = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(os.path.getmtime(path)))
+    return {column: row[position] for column, position in positions.items() if position < len(row)}, unknown_headers, scraped_at
+
+def read_tender_files(paths):
+    return [read_tender_file(path) for path in paths]
+
+def read_stored_tenders(folder):
+    '''
+    The tenders in the month's TenderStore, as read_tender_file returns them
+    '''
+    tenders = []
+    scraped_times = TenderStore.scraped_times(folder)
+    for stored_tender in TenderStore.read_tenders(folder):
+        positions, unknown_headers = tender_schema.resolve_columns([column_name for column_name, value in stored_tender])
+        record = {column: stored_tender[position][1] for column, position in positions.items()
+                  if stored_tender[position][1] is not None}
+        tenders.append((record, unknown_headers, scraped_times.get(record.get('Tender ID'))))
+    return tenders
+
+def read_month(folder, executor=None):
+    '''
+    Records of every tender of a month folder with their canonical columns, when each was
+    scraped, and how many tenders had each unknown header. The csvs are read in chunks of
+    FILES_PER_TASK by the executor's worker processes
+    '''
+    csvs = glob.glob(folder+'/*.csv')
+    tenders = read_stored_tenders(folder)
+    chunks = [csvs[start:start+FILES_PER_TASK] for start in range(0, len(csvs), FILES_PER_TASK)]
+    if executor is None:
+        results = [read_tender_files(chunk) for chunk in chunks]
+    else:
+        results = executor.map(read_tender_files, chunks)
+    for chunk_tenders in results:
+        tenders.extend(chunk_tenders)
+    unknown_headers = Counter(tender_schema.base_header(header) for record, headers, scraped_at in tenders for header in set(headers))
+    return [record for record, headers, scraped_at in tenders], [scraped_at for record, headers, scraped_at in tenders], unknown_headers
+
+def write_csv(frame, path):
+    '''
+    Writes the csv next to path first, so a run stopped halfway never leaves a truncated month
+    '''
+    temporary_path = path + '.tmp'
+    frame.to_csv(temporary_path, index=False)
+    os.replace(temporary_path, path)
+
+def keep_latest_stage(frame, scraped_times):
+    '''
+    One row per Tender ID: the most advanced stage, then the latest scraped, in the frame's order
+    '''
+    ranked = frame.assign(stage_rank=frame['Tender Stage'].map(tender_schema.stage_rank), scraped_at=scraped_times)
+    ranked = ranked.sort_values(['stage_rank', 'scraped_at'], kind='stable', na_position='first')
+    ranked = ranked.drop_duplicates(subset=['Tender ID'], keep='last').sort_index()
+    return frame.loc[ranked.index], ranked['scraped_at']
+
+def concatinate_month(folder, data_path, executor=None, index=None):
+    '''
+    Writes <data_path>/<YYYY_MM>_tenders.csv from the tenders scraped for the month, and
+    replaces the month's tenders in the TenderIndex.
+    Returns the name of the csv, None if the month has no tenders
+    '''
+    month_name = os.path.basename(folder)
+    print(month_name)
+    records, scraped_times, unknown_headers = read_month(folder, executor)
+    print('Number of tenders: ',len(records))
+    if len(records)==0:
+        if index is not None:
+            index.replace_month(month_name, [])
+        return None
+    if unknown_headers:
+        print('Unknown headers (tenders): {}'.format(dict(unknown_headers.most_common())))
+    found_columns = set(column for record in records for column in record)
+    missing_columns = [column for column in tender_schema.COLUMN_NAMES if column not in found_columns]
+    if missing_columns:
+        print('Warning: no {} in {}, left empty'.format(missing_columns, month_name))
+
+    master_df = tender_schema.typed_frame(records)
+    master_df = master_df.dropna(subset=['Tender ID'])
+    master_df, scraped_at = keep_latest_stage(master_df, scraped_times)
+    if index is not None:
+        index.replace_month(month_name, zip(master_df['Tender ID'], master_df['Tender Stage'].where(master_df['Tender Stage'].notna(), None), scraped_at))
+    master_df['Department'] = master_df['Organisation Chain']
+    output = '{}_tenders.csv'.format(month_name)
+    write_csv(master_df, os.path.join(data_path, output))
+    return output
+
+def month_name(year_month):
+    '''
+    "YYYY_MM" folder name of a "YYYY-MM" month
+    '''
+    year, month = [int(part) for part in year_month.split('-')]
+    return '{}_{:02d}'.format(year, month)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concatinates the scraped tenders of every month into data/monthly_tenders/<YYYY_MM>_tenders.csv, "
+                                                 "rebuilding only the months whose raw files changed since the last run")
+    parser.add_argument("start", nargs="?", help="first month, eg: 2016-01. Every scraped month by default")
+    parser.add_argument("end", nargs="?", help="last month, eg: 2025-12")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="worker processes reading the raw files")
+    parser.add_argument("--force", action="store_true", help="rebuild the months even if their raw files did not change")
+    args = parser.parse_args()
+
+    scraped_path = os.getcwd() + '/Sources/TENDERS/scripts/scraper/scraped_recent_tenders'
+    data_path = os.getcwd() + '/Sources/TENDERS/data/monthly_tenders/'
+    all_months = month_folders(scraped_path)
+    months = [month for month in all_months
+              if (args.start is None or month >= month_name(args.start)) and (args.end is None or month <= month_name(args.end))]
+    manifest = RawManifest(scraped_path, data_path)
+    manifest.forget_missing(all_months)
+    index = TenderIndex(data_path)
+    index.forget_missing(all_months)
+    # the index is made while building the months, without it they are all built again
+    force = args.force or not index.loaded
+    rebuilt = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.processes) as executor:
+            for month in months:
+                fingerprint = manifest.month_inputs(month)
+                if not force and manifest.is_built(month, fingerprint):
+                    continue
+                output = concatinate_month(os.path.join(scraped_path, month), data_path, executor, index)
+                manifest.mark_built(month, fingerprint, output)
+                rebuilt += 1
+    finally:
+        manifest.save()
+        index.save()
+    print('Months rebuilt: {} of {}, raw files hashed: {}'.format(rebuilt, len(months), manifest.hashed))
+    print('Tenders in more than one month: {}'.format(index.duplicates()))
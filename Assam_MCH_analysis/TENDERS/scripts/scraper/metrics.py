@@ -0,0 +1,103 @@
+# Timings and counters of a scraping run, written out at the end of every shard (month and tender status)
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+class ScraperMetrics(object):
+    '''
+    Time spent per stage (listing, tender_page, detail, stage_summary, captcha, write),
+    for every tender and every listing page, plus counts of WebDriver calls per command
+    and of events like retries and timeouts. Safe to share between worker threads
+    '''
+    def __init__(self, shard=''):
+        self.shard = shard
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+        self.stage_totals = defaultdict(lambda: {"count": 0, "total_s": 0.0, "max_s": 0.0})
+        self.tenders = defaultdict(dict)
+        self.pages = defaultdict(dict)
+        self.webdriver_calls = Counter()
+        self.events = Counter()
+
+    @contextmanager
+    def timer(self, stage, tender_id=None, page_index=None):
+        '''
+        Times the block as stage, for the tender or listing page if given
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start, tender_id, page_index)
+
+    def add_time(self, stage, seconds, tender_id=None, page_index=None):
+        with self.lock:
+            totals = self.stage_totals[stage]
+            totals["count"] += 1
+            totals["total_s"] += seconds
+            totals["max_s"] = max(totals["max_s"], seconds)
+            if tender_id is not None:
+                self.tenders[tender_id][stage] = self.tenders[tender_id].get(stage, 0) + seconds
+            if page_index is not None:
+                self.pages[page_index][stage] = self.pages[page_index].get(stage, 0) + seconds
+
+    def count(self, event, number=1):
+        with self.lock:
+            self.events[event] += number
+
+    def instrument_browser(self, browser):
+        '''
+        Counts every command the browser sends to the WebDriver, element calls included.
+        Instrumenting a browser again moves its counting to this ScraperMetrics
+        '''
+        execute = getattr(browser, "uninstrumented_execute", browser.execute)
+        browser.uninstrumented_execute = execute
+        def counted_execute(driver_command, params=None):
+            with self.lock:
+                self.webdriver_calls[driver_command] += 1
+            return execute(driver_command, params)
+        browser.execute = counted_execute
+
+    def to_dict(self):
+        with self.lock:
+            return {"shard": self.shard,
+                    "wall_time_s": round(time.time() - self.start_time, 3),
+                    "stages": {stage: dict(totals) for stage, totals in self.stage_totals.items()},
+                    "webdriver_calls": dict(self.webdriver_calls),
+                    "webdriver_calls_total": sum(self.webdriver_calls.values()),
+                    "events": dict(self.events),
+                    "pages": {str(page_index): dict(stages) for page_index, stages in self.pages.items()},
+                    "tenders": {tender_id: dict(stages) for tender_id, stages in self.tenders.items()}}
+
+    def to_prometheus(self):
+        '''
+        The totals in the Prometheus text format, per tender and per page timings are only in the json
+        '''
+        metrics = self.to_dict()
+        shard = 'shard="{}"'.format(metrics["shard"])
+        lines = ["# TYPE scraper_wall_time_seconds gauge",
+                 "scraper_wall_time_seconds{{{}}} {}".format(shard, metrics["wall_time_s"]),
+                 "# TYPE scraper_stage_seconds_total counter"]
+        for stage, totals in sorted(metrics["stages"].items()):
+            lines.append('scraper_stage_seconds_total{{{},stage="{}"}} {:.3f}'.format(shard, stage, totals["total_s"]))
+        lines.append("# TYPE scraper_stage_runs_total counter")
+        for stage, totals in sorted(metrics["stages"].items()):
+            lines.append('scraper_stage_runs_total{{{},stage="{}"}} {}'.format(shard, stage, totals["count"]))
+        lines.append("# TYPE scraper_webdriver_calls_total counter")
+        for command, calls in sorted(metrics["webdriver_calls"].items()):
+            lines.append('scraper_webdriver_calls_total{{{},command="{}"}} {}'.format(shard, command, calls))
+        lines.append("# TYPE scraper_events_total counter")
+        for event, number in sorted(metrics["events"].items()):
+            lines.append('scraper_events_total{{{},event="{}"}} {}'.format(shard, event, number))
+        return "\n".join(lines) + "\n"
+
+    def save(self, path_prefix):
+        '''
+        Writes <path_prefix>.json and <path_prefix>.prom
+        '''
+        with open(path_prefix + ".json", "w", encoding="utf-8") as metrics_file:
+            json.dump(self.to_dict(), metrics_file, indent=1)
+        with open(path_prefix + ".prom", "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(self.to_prometheus())
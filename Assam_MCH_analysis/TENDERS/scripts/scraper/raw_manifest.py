@@ -0,0 +1,107 @@
+# Manifest of the raw files the monthly tenders were built from, so only the months whose files changed are rebuilt
+import hashlib
+import json
+import os
+import re
+from tender_store import STORE_NAME
+import tender_schema
+
+MANIFEST_NAME = "raw_manifest.json"
+MONTH_FOLDER = re.compile(r"^\d{4}_\d{2}$")
+# the -shm file of the store is only an index of its write-ahead log
+STORE_FILES = (STORE_NAME, STORE_NAME + "-wal")
+
+def month_folders(scraped_path):
+    '''
+    Names of the YYYY_MM folders of scraped_path, in order
+    '''
+    return sorted(name for name in os.listdir(scraped_path)
+                  if MONTH_FOLDER.match(name) and os.path.isdir(os.path.join(scraped_path, name)))
+
+def file_hash(path):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as raw_file:
+        for block in iter(lambda: raw_file.read(1 << 20), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+def schema_fingerprint():
+    return hashlib.sha1(repr(tender_schema.TENDER_COLUMNS).encode("utf-8")).hexdigest()
+
+class RawManifest(object):
+    '''
+    Keeps, for every raw file of scraped_path (the final_<tender id>.csv files and the
+    tenders.sqlite store of each month), its size, mtime, sha1, tender id and month, and for
+    every month the fingerprint of the files and schema its monthly csv was built from.
+    A file is hashed again only when its size or mtime changed.
+    Saved to <data_path>/raw_manifest.json
+    '''
+    def __init__(self, scraped_path, data_path):
+        self.scraped_path = scraped_path
+        self.data_path = data_path
+        self.path = os.path.join(data_path, MANIFEST_NAME)
+        self.files = {}
+        self.months = {}
+        self.hashed = 0
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as manifest:
+                saved = json.load(manifest)
+            self.files = saved["files"]
+            self.months = saved["months"]
+
+    def month_inputs(self, month):
+        '''
+        Stats the raw files of a month folder, hashing the new and changed ones.
+        Returns the fingerprint of the month's files and of the schema
+        '''
+        folder = os.path.join(self.scraped_path, month)
+        scanned = {}
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if not entry.is_file() or not (entry.name.endswith(".csv") or entry.name in STORE_FILES):
+                    continue
+                path = month + "/" + entry.name
+                stat = entry.stat()
+                known = self.files.get(path)
+                if known is None or known["size"] != stat.st_size or known["mtime"] != stat.st_mtime:
+                    tender_id = entry.name[len("final_"):-len(".csv")] if entry.name.startswith("final_") else None
+                    known = {"size": stat.st_size, "mtime": stat.st_mtime, "sha1": file_hash(entry.path),
+                             "tender_id": tender_id, "month": month}
+                    self.hashed += 1
+                scanned[path] = known
+        for path in [path for path, known in self.files.items() if known["month"] == month and path not in scanned]:
+            del self.files[path]
+        self.files.update(scanned)
+        fingerprint = hashlib.sha1(schema_fingerprint().encode("utf-8"))
+        for path in sorted(scanned):
+            fingerprint.update("{} {}\n".format(path, scanned[path]["sha1"]).encode("utf-8"))
+        return fingerprint.hexdigest()
+
+    def is_built(self, month, fingerprint):
+        '''
+        True if the month's csv was built from these inputs and is still there
+        '''
+        built = self.months.get(month)
+        if built is None or built["inputs"] != fingerprint:
+            return False
+        return built["output"] is None or os.path.exists(os.path.join(self.data_path, built["output"]))
+
+    def mark_built(self, month, fingerprint, output):
+        '''
+        output is the name of the month's csv, None if the month had no tenders
+        '''
+        self.months[month] = {"inputs": fingerprint, "output": output}
+
+    def forget_missing(self, months):
+        '''
+        Drops the files and months of folders no longer in scraped_path
+        '''
+        months = set(months)
+        self.files = {path: known for path, known in self.files.items() if known["month"] in months}
+        self.months = {month: built for month, built in self.months.items() if month in months}
+
+    def save(self):
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as manifest:
+            json.dump({"files": self.files, "months": self.months}, manifest)
+        os.replace(temporary_path, self.path)
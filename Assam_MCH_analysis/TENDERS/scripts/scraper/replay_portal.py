@@ -0,0 +1,278 @@
+# Records pages of the portal while scraping and serves them back from a local server,
+# so the scraper can be benchmarked without assamtenders.gov.in
+import argparse
+import html
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from http.cookies import SimpleCookie
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, quote, unquote
+from lxml import html as lxml_html
+
+class PageRecorder(object):
+    '''
+    Saves the first max_pages listing pages of a scraping run, and the tender, "View More
+    Details" and stage summary pages of the tenders on them, to record_dir. manifest.json
+    keeps the tender ids of every recorded listing page
+    '''
+    def __init__(self, record_dir, max_pages=2):
+        self.record_dir = record_dir
+        self.max_pages = max_pages
+        self.lock = threading.Lock()
+        self.pages = []
+        os.makedirs(record_dir, exist_ok=True)
+
+    def record_listing(self, page_source, tender_ids):
+        with self.lock:
+            if len(self.pages) >= self.max_pages:
+                return
+            self.write("listing_{}.html".format(len(self.pages)), page_source)
+            self.pages.append(list(tender_ids))
+            with open(os.path.join(self.record_dir, "manifest.json"), "w", encoding="utf-8") as manifest:
+                json.dump({"pages": self.pages}, manifest, indent=1)
+
+    def record_page(self, kind, tender_id, page_source):
+        '''
+        kind is tender, details or summary
+        '''
+        with self.lock:
+            if any(tender_id in page for page in self.pages):
+                self.write("{}_{}.html".format(kind, tender_id), page_source)
+
+    def write(self, name, page_source):
+        with open(os.path.join(self.record_dir, name), "w", encoding="utf-8") as page:
+            page.write(page_source)
+
+# values of the tenderStatus drop down of the portal's search form
+TENDER_STATUS_IDS = [str(status_id) for status_id in range(1, 9)]
+SEARCH_YEARS = [str(year) for year in range(2010, 2031)]
+SESSION_COOKIE = "JSESSIONID"
+
+# picking a day in a calendar writes its date to the hidden field the calendar is for
+CALENDAR_SCRIPT = '''<script>
+for (const calendar of document.querySelectorAll(".calendar")) {
+  for (const day of calendar.querySelectorAll(".days td")) {
+    day.addEventListener("click", function () {
+      const month = String(Number(calendar.querySelector(".month").value) + 1).padStart(2, "0");
+      document.getElementById(calendar.dataset.field).value =
+        calendar.querySelector(".year").value + "-" + month + "-" + day.textContent.padStart(2, "0");
+    });
+  }
+}
+</script>'''
+
+def options(values, labels=None, selected=None):
+    return "".join('<option value="{}"{}>{}</option>'.format(value, ' selected' if value == selected else '', label)
+                   for value, label in zip(values, labels or values))
+
+def calendar(field):
+    '''
+    Stand-in for the portal's date picker: a month and a year drop down, then the days 1 to 31
+    '''
+    days = "".join("<tr>{}</tr>".format("".join("<td>{}</td>".format(day) for day in range(week, min(week + 7, 32))))
+                   for week in range(1, 32, 7))
+    return ('<div class="calendar" data-field="{}"><div><table><tbody><tr><td>&lt;</td>'
+            '<td><select class="month">{}</select></td><td><select class="year">{}</select></td>'
+            '</tr></tbody></table></div><div><table class="days"><tbody>{}</tbody></table></div></div>').format(
+        field, options([str(month) for month in range(12)]), options(SEARCH_YEARS), days)
+
+def search_page(captcha, error='', tender_status=None, from_date='', to_date=''):
+    '''
+    Stand-in for the search form, with the layout select_search_filters drives: the tender status
+    drop down, the From and To date links opening the calendars that follow the form, the captcha
+    image and text box when asked for, and the Search button. Like the portal, a form sent back
+    with an error keeps the tender status and dates submitted, only the captcha is typed again
+    '''
+    error_text = '<span class="error">{}</span>'.format(error) if error else ''
+    captcha_fields = ('<img id="captchaImage" alt="captcha" width="100" height="30">'
+                      '<input type="text" id="captchaText" name="captchaText">') if captcha else ''
+    date_links = ('<table><tbody><tr><td><table><tbody><tr><td>Published Date</td></tr><tr><td></td></tr>'
+                  '<tr><td>From</td><td><a href="#">From Date</a></td><td>To</td><td><a href="#">To Date</a></td></tr>'
+                  '</tbody></table></td></tr></tbody></table>')
+    form = ('<form id="frmSearchFilter" method="get" action="/search"><table><tbody><tr><td><table><tbody><tr><td>'
+            '<table><tbody><tr><td><table><tbody>'
+            '<tr><td>{}</td></tr>'
+            '<tr><td>Tender Status <select id="tenderStatus" name="tenderStatus">{}</select></td></tr>'
+            '<tr><td>{}</td></tr>'
+            '<tr><td>{}</td></tr>'
+            '<tr><td><input type="hidden" id="fromDate" name="fromDate" value="{}"><input type="hidden" id="toDate" name="toDate" value="{}">'
+            '<input type="submit" id="Search" value="Search"></td></tr>'
+            '</tbody></table></td></tr></tbody></table></td></tr></tbody></table></td></tr></tbody></table></form>').format(
+        error_text, options(TENDER_STATUS_IDS, selected=tender_status), captcha_fields, date_links,
+        html.escape(from_date), html.escape(to_date))
+    return '<html><body id="Body"><div>{}</div>{}{}{}</body></html>'.format(
+        form, calendar("fromDate"), calendar("toDate"), CALENDAR_SCRIPT)
+
+class ReplayPortal(ThreadingHTTPServer):
+    '''
+    Serves a recording made with PageRecorder:
+    /                      search form, with a captcha unless captcha is False or the session solved one
+    /search                rejects the first captcha_rejects answers, then redirects to the listing
+                           once a tender status and both dates are picked
+    /listing/<page>        listing page, the recording is repeated to give pages pages
+    /tender/<tender id>    tender page, its DirectLink and DirectLink_0 open /details and /summary
+    Every response waits latency seconds first. Tenders of repeated pages get a -c<copy> suffix.
+    Like the portal, a captcha is asked for once per session cookie: solved_sessions keeps the
+    sessions that solved one, and searches the (tenderStatus, fromDate, toDate) of every search
+    '''
+    daemon_threads = True
+
+    def __init__(self, server_address, record_dir, latency=0.0, pages=None, captcha=True, captcha_rejects=0):
+        super().__init__(server_address, ReplayRequestHandler)
+        self.record_dir = record_dir
+        with open(os.path.join(record_dir, "manifest.json"), encoding="utf-8") as manifest:
+            self.recorded_pages = json.load(manifest)["pages"]
+        self.latency = latency
+        self.pages = pages or len(self.recorded_pages)
+        self.captcha = captcha
+        self.captcha_rejects = captcha_rejects
+        self.lock = threading.Lock()
+        self.cache = {}
+        self.solved_sessions = set()
+        self.searches = []
+
+    def read_recording(self, name):
+        with open(os.path.join(self.record_dir, name), encoding="utf-8") as page:
+            return lxml_html.fromstring(page.read())
+
+    def make_static(self, document):
+        '''
+        Drops what would make the browser load anything from the real portal
+        '''
+        for element in document.xpath("//script|//link|//base|//iframe"):
+            element.drop_tree()
+        for element in document.xpath("//*[@src]"):
+            del element.attrib["src"]
+        for element in document.xpath("//*[@onclick]"):
+            del element.attrib["onclick"]
+        return document
+
+    def listing_page(self, page_index):
+        copy, recorded_index = divmod(page_index, len(self.recorded_pages))
+        document = self.make_static(self.read_recording("listing_{}.html".format(recorded_index)))
+        table = document.xpath('//*[@id="tabList"]')[0]
+        rows = table.xpath(".//tr")[1:-2]
+        for row, tender_id in zip(rows, self.recorded_pages[recorded_index]):
+            served_id = tender_id if copy == 0 else "{}-c{}".format(tender_id, copy)
+            for node in row.xpath("td[2]")[0].iter():
+                if node.text:
+                    node.text = node.text.replace(tender_id, served_id)
+                if node.tail:
+                    node.tail = node.tail.replace(tender_id, served_id)
+            for anchor in row.xpath(".//a"):
+                anchor.set("href", "/tender/{}".format(quote(served_id)))
+        for anchor in document.xpath('//*[@id="loadNext"]'):
+            if page_index + 1 < self.pages:
+                anchor.set("href", "/listing/{}".format(page_index + 1))
+            else:
+                anchor.drop_tree()
+        return document
+
+    def tender_page(self, kind, served_id):
+        tender_id = re.sub(r"-c\d+$", "", served_id)
+        document = self.make_static(self.read_recording("{}_{}.html".format(kind, tender_id)))
+        if kind == "tender":
+            for element_id, target in [("DirectLink", "details"), ("DirectLink_0", "summary")]:
+                for anchor in document.xpath('//a[@id="{}"]'.format(element_id)):
+                    anchor.set("href", "/{}/{}".format(target, quote(served_id)))
+                    anchor.set("target", "_blank")
+        return document
+
+    def render(self, path):
+        '''
+        The html for a path, None if there is no such page
+        '''
+        if path not in self.cache:
+            parts = [unquote(part) for part in path.strip("/").split("/")]
+            try:
+                if parts[0] == "listing" and int(parts[1]) < self.pages:
+                    document = self.listing_page(int(parts[1]))
+                elif parts[0] in ("tender", "details", "summary"):
+                    document = self.tender_page(parts[0], parts[1])
+                else:
+                    return None
+            except (IndexError, ValueError, OSError):
+                return None
+            self.cache[path] = lxml_html.tostring(document, encoding="unicode")
+        return self.cache[path]
+
+class ReplayRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        portal = self.server
+        time.sleep(portal.latency)
+        request = urlparse(self.path)
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        self.session = cookie[SESSION_COOKIE].value if SESSION_COOKIE in cookie else None
+        with portal.lock:
+            captcha = portal.captcha and self.session not in portal.solved_sessions
+        if request.path == "/":
+            self.send_html(search_page(captcha))
+        elif request.path == "/search":
+            self.search(parse_qs(request.query), captcha)
+        else:
+            page = portal.render(request.path)
+            if page is None:
+                self.send_error(404)
+            else:
+                self.send_html(page)
+
+    def search(self, query, captcha):
+        portal = self.server
+        fields = [query.get(field, [''])[0] for field in ("tenderStatus", "fromDate", "toDate")]
+        if captcha:
+            with portal.lock:
+                rejected = portal.captcha_rejects > 0
+                if rejected:
+                    portal.captcha_rejects -= 1
+            if rejected or not query.get("captchaText"):
+                self.send_html(search_page(True, "Invalid Captcha! Please Enter Correct Captcha.", *fields))
+                return
+        if not all(fields):
+            self.send_html(search_page(captcha, "Please select the tender status and the published dates", *fields))
+            return
+        with portal.lock:
+            if self.session is None:
+                self.session = uuid.uuid4().hex
+            portal.solved_sessions.add(self.session)
+            portal.searches.append(tuple(fields))
+        self.send_response(302)
+        self.send_header("Location", "/listing/0")
+        self.send_session_cookie()
+        self.end_headers()
+
+    def send_html(self, page):
+        body = page.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_session_cookie()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_session_cookie(self):
+        '''
+        Gives a browser without a session one, its captcha is then solved for that session
+        '''
+        if self.session is None:
+            self.session = uuid.uuid4().hex
+        self.send_header("Set-Cookie", "{}={}; Path=/".format(SESSION_COOKIE, self.session))
+
+    def log_message(self, format, *args):
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves pages recorded with --record-dir as a stand-in for the portal")
+    parser.add_argument("record_dir")
+    parser.add_argument("--port",type=int,default=8000)
+    parser.add_argument("--latency",type=float,default=0.0,help="seconds every response waits")
+    parser.add_argument("--pages",type=int,help="listing pages to serve, the recording is repeated to fill them")
+    parser.add_argument("--no-captcha",action="store_true",help="search without a captcha")
+    parser.add_argument("--captcha-rejects",type=int,default=0,help="number of captcha answers rejected before the search goes through")
+    args = parser.parse_args()
+    portal = ReplayPortal(("127.0.0.1",args.port),args.record_dir,args.latency,args.pages,not args.no_captcha,args.captcha_rejects)
+    print("Serving {} listing pages on http://127.0.0.1:{}/".format(portal.pages,portal.server_port))
+    portal.serve_forever()
@@ -1,15 +1,123 @@
 import subprocess
 import os
-from datetime import date, timedelta
+import sys
+import time
+import argparse
+import json
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from scraper_assam_recent_tenders_tender_status import month_folder, dict_tender_status
 
-cwd = os.getcwd()
-script_path = cwd+r'/Sources/TENDERS/scripts/scraper/scraper_assam_recent_tenders_tender_status.py'
+script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),'scraper_assam_recent_tenders_tender_status.py')
 
-for year in range(2025,2026):
-    year = str(year)
-    for month in range(9,11):        
-        month=str(month)
-        print(year+'_'+month)
-        #subprocess.call([r"/opt/anaconda3/bin/python3", script_path, year, month])
-        subprocess.call([r"C:\Users\saura\anaconda3\envs\cdl-env\python.exe", script_path, year, month])
+def parse_month(value):
+    '''
+    "2016-04" -> (2016, 4)
+    '''
+    year,month = value.split('-')
+    return int(year),int(month)
 
+def enumerate_shards(start,end,statuses):
+    '''
+    (year, month, tender status) for every month from start to end, both included
+    '''
+    shards = []
+    year,month = start
+    while (year,month) <= end:
+        for tender_status_id in statuses:
+            shards.append((year,month,tender_status_id))
+        year,month = (year+1,1) if month == 12 else (year,month+1)
+    return shards
+
+def shard_name(shard):
+    year,month,tender_status_id = shard
+    return "{}_{:02d}_status{}".format(year,month,tender_status_id)
+
+def metrics_path(shard):
+    year,month,tender_status_id = shard
+    return os.path.join(month_folder(year,month),"metrics_{}.json".format(tender_status_id))
+
+def read_metrics(shard,since=0):
+    '''
+    The metrics file the scraper wrote for the shard, empty if there is none or it was
+    written before since (a time.time()), by an earlier run
+    '''
+    path = metrics_path(shard)
+    if not os.path.exists(path) or os.path.getmtime(path) < since:
+        return {}
+    with open(path,encoding="utf-8") as metrics_file:
+        return json.load(metrics_file)
+
+def run_shard(shard,log_dir,retries,scraper_args,log_to_console=False):
+    '''
+    Runs the scraper for one shard in its own process, again up to retries times if it fails.
+    Output goes to <log_dir>/<shard>.log
+    The counts are summed over the metrics file every attempt writes, so only the tenders of this
+    shard's status scraped by this run are counted, not the other statuses stored in the month folder
+    '''
+    year,month,tender_status_id = shard
+    command = [sys.executable,script_path,str(year),str(month),"--statuses",tender_status_id] + scraper_args
+    start = time.perf_counter()
+    totals = {"tenders_scraped": 0, "webdriver_calls": 0, "captcha_attempts": 0}
+    for attempt in range(retries+1):
+        attempt_start = time.time()
+        if log_to_console:
+            returncode = subprocess.call(command)
+        else:
+            with open(os.path.join(log_dir,shard_name(shard)+".log"),"a",encoding="utf-8") as log_file:
+                log_file.write("=== attempt {} of {}: {}\n".format(attempt+1,retries+1," ".join(command)))
+                log_file.flush()
+                returncode = subprocess.call(command,stdout=log_file,stderr=subprocess.STDOUT,stdin=subprocess.DEVNULL)
+        metrics = read_metrics(shard,attempt_start)
+        totals["tenders_scraped"] += metrics.get("events",{}).get("tenders_scraped",0)
+        totals["webdriver_calls"] += metrics.get("webdriver_calls_total",0)
+        totals["captcha_attempts"] += metrics.get("events",{}).get("captcha_attempts",0)
+        if returncode == 0:
+            break
+        print("{} failed with exit code {} (attempt {} of {})".format(shard_name(shard),returncode,attempt+1,retries+1))
+        # a retry resumes what the failed attempt scraped, instead of scraping it again
+        command = [argument for argument in command if argument != "--rescrape"]
+    return {"shard": shard_name(shard),
+            "status": "ok" if returncode == 0 else "failed",
+            "attempts": attempt+1,
+            "tenders_scraped": totals["tenders_scraped"],
+            "wall_time_s": round(time.perf_counter()-start,1),
+            "webdriver_calls": totals["webdriver_calls"],
+            "captcha_attempts": totals["captcha_attempts"]}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs the tender status scraper for every month and tender status of a date range, several shards at once. "
+                                                 "Arguments not listed here are passed on to the scraper")
+    parser.add_argument("start",type=parse_month,help="first month, eg: 2016-01")
+    parser.add_argument("end",type=parse_month,help="last month, eg: 2025-12")
+    parser.add_argument("--statuses",nargs="+",choices=list(dict_tender_status.keys()),default=['6'],
+                        help="tender status ids to scrape, AOC (6) by default")
+    parser.add_argument("--processes",type=int,default=4,help="number of shards scraped at the same time")
+    parser.add_argument("--retries",type=int,default=2,help="times a failed shard is run again")
+    parser.add_argument("--captcha",choices=["manual","ocr"],default="ocr",
+                        help="with manual captchas the shards run one at a time, printing to the console")
+    parser.add_argument("--log-dir",default=os.path.join(os.getcwd()+r'/Sources/TENDERS/scripts/scraper/scraped_recent_tenders','logs'))
+    args, scraper_args = parser.parse_known_args()
+    scraper_args = scraper_args + ["--captcha",args.captcha]
+
+    os.makedirs(args.log_dir,exist_ok=True)
+    shards = enumerate_shards(args.start,args.end,args.statuses)
+    manual_captcha = args.captcha == "manual"
+    processes = 1 if manual_captcha else args.processes
+    print("{} shards, {} at a time, logs in {}".format(len(shards),processes,args.log_dir))
+
+    results = []
+    with ThreadPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(run_shard,shard,args.log_dir,args.retries,scraper_args,manual_captcha) for shard in shards]
+        for future in as_completed(futures):
+            result = future.result()
+            print("{shard}: {status}, {tenders_scraped} tenders in {wall_time_s}s".format(**result))
+            results.append(result)
+
+    summary = pd.DataFrame(results).sort_values("shard")
+    summary.to_csv(os.path.join(args.log_dir,"summary.csv"),index=False)
+    print(summary.to_string(index=False))
+    failed = summary[summary["status"] == "failed"]
+    if len(failed):
+        print("{} shards failed, run the same command again to resume them".format(len(failed)))
+        sys.exit(1)
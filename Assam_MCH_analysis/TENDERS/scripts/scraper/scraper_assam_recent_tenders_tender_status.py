@@ -1,11 +1,21 @@
 #from WebDriver import WebDriver
-from Utils import SeleniumScrappingUtils
-import time 
+from Utils import SeleniumScrappingUtils, HtmlScrappingUtils, RETRYABLE_ERRORS, MAX_RELOADS
+from checkpoint import ScrapeCheckpoint
+from metrics import ScraperMetrics
+from replay_portal import PageRecorder
+from tender_store import TenderStore
+from tender_schema import TENDER_STATUS_STAGES
+import time
 import os
 import warnings
 from captcha import captcha
 import re
 import pdb
+import argparse
+import queue
+import threading
+from collections import Counter
+from urllib.parse import urljoin
 from selenium.webdriver.common.by import By
 
 from selenium import webdriver
@@ -16,46 +26,17 @@ import pandas as pd
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import sys
-warnings.filterwarnings("ignore", category=DeprecationWarning) 
+warnings.filterwarnings("ignore", category=DeprecationWarning)
 import pytesseract
 
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-year = sys.argv[1]
-month =sys.argv[2]
-
-month_start = str(int(month)-1)
-month_end = str(int(month)-1)
-if month_end in ['0','2','4','6','7','9','11']:
-    date_end = '31'
-elif month_end=='1':
-    date_end='28'
-else:
-    date_end = '30'
-
-
-if int(month)<10:
-    month = '0'+str(month)
-folder = year+'_'+str(month)
-try:
-    print(os.getcwd())
-    os.mkdir(os.getcwd()+r'/Sources/TENDERS/scripts/scraper/scraped_recent_tenders/'+folder)
-except FileExistsError:
-    pass
-
-try:
-    os.mkdir(os.getcwd()+r'/Sources/TENDERS/scripts/scraper/scraped_recent_tenders/concatinated_csvs')
-except:
-    pass
 
 url = r'https://assamtenders.gov.in/nicgep/app?page=WebTenderStatusLists&service=page'
-print(url)
 firefox_options = Options()
 firefox_options.headless = True
 #service=Service(r"D:\CivicDataLab_IDS-DRR\IDS-DRR_Github\IDS-DRR-Assam\Sources\TENDERS\scripts\scraper\chromedriver")
 service = Service(r"C:\Users\saura\anaconda3\Scripts\geckodriver.exe")
 #browser = WebDriver()
-print(firefox_options)
-os.chdir(os.getcwd()+r"/Sources/TENDERS/scripts/scraper/scraped_recent_tenders")
 dict_tables_type = {"Bids List": "Vertical","Technical Bid Opening Summary":"Horizontal",
                    "Technical Evaluation Summary Details":"Horizontal",
                    "Bid Opening Summary":"Horizontal",
@@ -67,14 +48,13 @@ dict_tables_type = {"Bids List": "Vertical","Technical Bid Opening Summary":"Hor
                    "Tender Revocation List":"Vertical",
                    "Corrigendum Details":"Vertical"}
 
-dict_tender_status = {'1': "To be Opened Tenders",
-                      '2': "Technical Bid Opening",
-                      '3': "Technical Evaluation",
-                      '4': "Financial Bid Opening",
-                      '5': "Financial Evaluation",
-                      '6': "AOC",
-                      '7': "Retender",
-                      '8': "Cancelled"}
+dict_tender_status = TENDER_STATUS_STAGES
+
+def month_folder(year,month):
+    '''
+    Folder the tenders of a month are saved to, relative to the directory the scraper runs from
+    '''
+    return os.path.join(os.getcwd()+r'/Sources/TENDERS/scripts/scraper/scraped_recent_tenders',"{}_{:02d}".format(year,int(month)))
 
 def sanitize_filename(filename):
     # Remove invalid characters: \ / : * ? " < > | (on Windows)
@@ -90,7 +70,7 @@ def captcha_input(xpath_image,xpath_input_text):
     captcha_input_element = SeleniumScrappingUtils.get_page_element(browser,xpath_input_text)
     #SeleniumScrappingUtils.input_text_box(browser, captcha_input_element,captcha_text)
     #wait = WebDriverWait(browser, 10)
-    button = browser.find_element(By.XPATH, "//*[@id='Search']") 
+    button = browser.find_element(By.XPATH, "//*[@id='Search']")
     button.click()
     invalid_string = browser.find_elements(By.CLASS_NAME,"error")
     print(invalid_string)
@@ -102,7 +82,7 @@ def captcha_input(xpath_image,xpath_input_text):
             captcha_input_element = SeleniumScrappingUtils.get_page_element(browser,xpath_input_text)
             SeleniumScrappingUtils.input_text_box(browser, captcha_input_element,captcha_text)
             time.sleep(3)
-            
+
             button = browser.find_element(By.XPATH, "//*[@id='Search']")
             button.click()
 
@@ -114,14 +94,21 @@ def captcha_input(xpath_image,xpath_input_text):
             else:
                 pass
 '''
-def captcha_input(xpath_image, xpath_input_text):
+OCR_ATTEMPTS = 5
+
+def captcha_input(browser, xpath_image, xpath_input_text, solver="manual"):
     # 1) wait for the captcha <img> to load
     img = WebDriverWait(browser, 10).until(
         EC.presence_of_element_located((By.XPATH, xpath_image))
     )
 
-    # 2) give yourself time to read it and type it back
-    user_sol = input("🔒  Captcha is now visible in the browser.  Please type it here: ")
+    # 2) read it with tesseract, or give yourself time to read it and type it back
+    ocr_attempts = OCR_ATTEMPTS if solver == "ocr" else 0
+    if ocr_attempts:
+        user_sol = captcha(browser, xpath_image)
+        ocr_attempts -= 1
+    else:
+        user_sol = input("🔒  Captcha is now visible in the browser.  Please type it here: ")
 
     # 3) find the text‐box, clear & send your answer
     captcha_box = SeleniumScrappingUtils.get_page_element(browser, xpath_input_text)
@@ -130,27 +117,31 @@ def captcha_input(xpath_image, xpath_input_text):
 
     # 4) click Search
     browser.find_element(By.ID, "Search").click()
+    attempts = 1
 
     # 5) if it complains, let you retry
     errs = browser.find_elements(By.CLASS_NAME, "error")
     while errs and "Invalid Captcha!" in errs[0].text:
-        user_sol = input("⚠️  That didn’t work—please re-type the captcha: ")
+        if ocr_attempts:
+            user_sol = captcha(browser, xpath_image)
+            ocr_attempts -= 1
+        else:
+            user_sol = input("⚠️  That didn’t work—please re-type the captcha: ")
+        captcha_box = SeleniumScrappingUtils.get_page_element(browser, xpath_input_text)
         captcha_box.clear()
         captcha_box.send_keys(user_sol)
         browser.find_element(By.ID, "Search").click()
+        attempts += 1
         errs = browser.find_elements(By.CLASS_NAME, "error")
+    return attempts
 
-#Select tender status
-for tender_status_id in range(6,7): #AOC
-    browser = webdriver.Firefox(service=service, options=firefox_options)
-    browser.get(url)
-    wait = WebDriverWait(browser, 10)  # Wait up to 3 seconds
-    tender_status_id = str(tender_status_id)
-    print('tenderStatusid: ', dict_tender_status[tender_status_id])
+def select_search_filters(browser,tender_status_id,year,month_start,month_end,date_end):
+    '''
+    Selects the tender status and the date range on the search form
+    '''
     SeleniumScrappingUtils.select_drop_down(browser,'//*[@id="tenderStatus"]',tender_status_id) #3
 
-
-    #Select date for tender scraping 
+    #Select date for tender scraping
     #from date
     from_date_element = SeleniumScrappingUtils.get_page_element(browser, '//*[@id="frmSearchFilter"]/table/tbody/tr/td/table/tbody/tr/td/table/tbody/tr/td/table/tbody/tr[4]/td/table/tbody/tr/td/table/tbody/tr[3]/td[2]/a')
     from_date_element.click()
@@ -174,25 +165,21 @@ for tender_status_id in range(6,7): #AOC
     td_elements = browser.find_elements(By.XPATH, "//td[text()='{}']".format(date_end))
     td_elements[1].click()
 
-    #break captcha
-    captcha_input('//*[@id="captchaImage"]','//*[@id="captchaText"]')
-
-    def scrape_view_more_details(browser,tender_id):
-        view_more_details_element = SeleniumScrappingUtils.get_page_element(browser,'//*[@id="DirectLink"]')
-        view_more_details_element.click()
-        #time.sleep(3)
-        #since we are opening the new window selenium needs to change the focus
-    
-        #all the table elements
-        elem_not_found = True
-        while elem_not_found:
-            try:
-                window_after = browser.window_handles[1]
-                browser.switch_to.window(window_after)
-                elem = wait.until(EC.presence_of_element_located((By.XPATH, '/html/body/table/tbody/tr/td/table/tbody/tr[4]/td/table/tbody/tr/td/table/tbody/tr/td/table/tbody/tr[2]/td/table/tbody/tr[1]/td')))
-                elem_not_found = False
-            except:
-                pass
+def scrape_view_more_details(browser,tender_id,tender_status_id,bulk_dom=False,round_trips=None,recorder=None):
+    view_more_details_element = SeleniumScrappingUtils.get_page_element(browser,'//*[@id="DirectLink"]')
+    main_window = browser.current_window_handle
+    handles_before = browser.window_handles
+    view_more_details_element.click()
+    #since we are opening the new window selenium needs to change the focus
+    SeleniumScrappingUtils.switch_to_new_window(browser,handles_before)
+
+    #all the table elements
+    SeleniumScrappingUtils.wait_for_elements(browser,By.XPATH,'/html/body/table/tbody/tr/td/table/tbody/tr[4]/td/table/tbody/tr/td/table/tbody/tr/td/table/tbody/tr[2]/td/table/tbody/tr[1]/td')
+    if recorder is not None:
+        recorder.record_page("details",tender_id,browser.page_source)
+    if bulk_dom:
+        details_frame = extract_more_details_sections(SeleniumScrappingUtils.get_page_document(browser),tender_status_id,round_trips)
+    else:
         tables = SeleniumScrappingUtils.get_multiple_page_elements(browser,'/html/body/table/tbody/tr/td/table/tbody/tr[4]/td/table/tbody/tr/td/table/tbody/tr/td/table')[0].find_elements(By.CSS_SELECTOR,"table")
         dict_table_section_head = {}
         for table_section_elements in tables:
@@ -200,139 +187,625 @@ for tender_status_id in range(6,7): #AOC
                 dict_table_section_head[table_section_elements.find_element(By.CLASS_NAME,"section_head").text] = table_section_elements
             except:
                 continue
+        section_frames = []
         for index, (keys, values) in enumerate(dict_table_section_head.items()):
             keys = keys.replace("/","")
             if keys == "Tender Documents":
                 continue
             # elif keys == "Work /Item(s)":
-            #     SeleniumScrappingUtils.extract_horizontal_table(values,tender_id +"_"+"Work_Item"+"_" + str(index),1)
+            #     records = SeleniumScrappingUtils.extract_horizontal_records(values,1)
             elif (keys.startswith("Cover Details") or keys == "Latest Corrigendum List" or keys.startswith("Other")):
-                SeleniumScrappingUtils.extract_vertical_table(values,tender_id +"_"+keys+"_" + str(index),1)
+                records = SeleniumScrappingUtils.extract_vertical_records(values,1)
             elif keys == "Payment Instruments":
                 table_section = values.find_element(By.CSS_SELECTOR,"table")
-                SeleniumScrappingUtils.extract_vertical_table(table_section,tender_id +"_"+keys+"_" + str(index),1)
+                records = SeleniumScrappingUtils.extract_vertical_records(table_section,1)
             else:
-                SeleniumScrappingUtils.extract_horizontal_table(values,tender_id +"_"+keys+"_" + str(index),1)
-        path_to_save = "concatinated_csvs/"
-        SeleniumScrappingUtils.concatinate_csvs(path_to_save,tender_id,dict_tender_status[tender_status_id])
-        
-        directory = os.getcwd()
-        SeleniumScrappingUtils.remove_csvs(directory)
-        window_after = browser.window_handles[0]
-        browser.switch_to.window(window_after)
-
-    def scrape_view_stage_summary(browser,tender_id,dict_tables_type):
-        list_of_dict_tables_type = list(dict_tables_type.keys())
-        SeleniumScrappingUtils.get_page_element(browser,'//*[@id="DirectLink_0"]').click()
-        #time.sleep(3)
-        
-    
-        #all the table elements
-        elem_not_found = True
-        while elem_not_found:
-            try:
-                window_after = browser.window_handles[1]
-                browser.switch_to.window(window_after)
-                elem = wait.until(EC.presence_of_element_located((By.CLASS_NAME, 'table_list')))
-                sections = browser.find_elements(By.CLASS_NAME,"table_list")
-                elem_not_found = False
-            except:
-                pass
-        
-        try:
-            sections.append(browser.find_element_by_id("table_list"))
-        except:
-            pass
-        try:
-            sections.append(browser.find_element(By.CLASS_NAME,"list_table"))
-        except:
-            pass
-        # elems = sections[0].find_elements_by_xpath('//a[@href]')
-        # for index in elems:
-        #     name = index.get_attribute("text")
-        #     if ".pdf" in name or "BOQ Comparative Chart" in name:
-        #         index.click()
-        #         time.sleep(10)
-        #         name = index.get_attribute("text").replace("/t","").replace("/n","").replace(" ","").replace("\t","").replace("\n","")
-        #         if "BOQComparativeChart" in name:
-        #             os.rename(name+".xlsx","concatinated_csvs/"+tender_id+"_"+name+".xlsx")
-        #         else:
-        #             try:
-        #                 os.rename(name,"concatinated_csvs/"+tender_id+"_"+name)
-        #             except:
-        #                 time.sleep(50)
-        #                 os.rename(name,"concatinated_csvs/"+tender_id+"_"+name)
-        for index,name in enumerate(sections):
-            if index == 0:
-                SeleniumScrappingUtils.extract_horizontal_table(name,"Org_"+tender_id,0)
-                continue 
+                records = SeleniumScrappingUtils.extract_horizontal_records(values,1)
+            section_frames.append(SeleniumScrappingUtils.records_to_frame(records))
+        details_frame = concatinate_sections(section_frames,tender_status_id)
+
+    SeleniumScrappingUtils.return_to_window(browser,main_window)
+    return details_frame
+
+def scrape_view_stage_summary(browser,tender_id,dict_tables_type,tender_status_id,bulk_dom=False,round_trips=None,recorder=None):
+    list_of_dict_tables_type = list(dict_tables_type.keys())
+    view_stage_summary_element = SeleniumScrappingUtils.get_page_element(browser,'//*[@id="DirectLink_0"]')
+    main_window = browser.current_window_handle
+    handles_before = browser.window_handles
+    view_stage_summary_element.click()
+    SeleniumScrappingUtils.switch_to_new_window(browser,handles_before)
+
+    #all the table elements
+    sections = SeleniumScrappingUtils.wait_for_elements(browser,By.CLASS_NAME,"table_list")
+    if recorder is not None:
+        recorder.record_page("summary",tender_id,browser.page_source)
+    if bulk_dom:
+        summary_frame = extract_stage_summary_sections(SeleniumScrappingUtils.get_page_document(browser),dict_tables_type,tender_status_id,round_trips)
+        SeleniumScrappingUtils.return_to_window(browser,main_window)
+        return summary_frame
+
+    try:
+        sections.append(browser.find_element_by_id("table_list"))
+    except:
+        pass
+    try:
+        sections.append(browser.find_element(By.CLASS_NAME,"list_table"))
+    except:
+        pass
+    # elems = sections[0].find_elements_by_xpath('//a[@href]')
+    # for index in elems:
+    #     name = index.get_attribute("text")
+    #     if ".pdf" in name or "BOQ Comparative Chart" in name:
+    #         index.click()
+    #         time.sleep(10)
+    #         name = index.get_attribute("text").replace("/t","").replace("/n","").replace(" ","").replace("\t","").replace("\n","")
+    #         if "BOQComparativeChart" in name:
+    #             os.rename(name+".xlsx","concatinated_csvs/"+tender_id+"_"+name+".xlsx")
+    #         else:
+    #             try:
+    #                 os.rename(name,"concatinated_csvs/"+tender_id+"_"+name)
+    #             except:
+    #                 time.sleep(50)
+    #                 os.rename(name,"concatinated_csvs/"+tender_id+"_"+name)
+    section_frames = []
+    for index,name in enumerate(sections):
+        if index == 0:
+            records = SeleniumScrappingUtils.extract_horizontal_records(name,0)
+        else:
             header_name = name.find_element(By.CLASS_NAME,"section_head").text
             if (header_name in list_of_dict_tables_type) & (dict_tables_type[header_name] == "Vertical"):
-                SeleniumScrappingUtils.extract_vertical_table(name,header_name+"_"+tender_id,1)
+                records = SeleniumScrappingUtils.extract_vertical_records(name,1)
             else:
-                SeleniumScrappingUtils.extract_horizontal_table(name,header_name+"_"+tender_id,1)
-        path_to_save = "concatinated_csvs/"
+                records = SeleniumScrappingUtils.extract_horizontal_records(name,1)
+        section_frames.append(SeleniumScrappingUtils.records_to_frame(records))
+    SeleniumScrappingUtils.return_to_window(browser,main_window)
+    return concatinate_sections(section_frames,tender_status_id)
+
+
+
+def get_table_links(browser,table_xpath,bulk_dom=False,round_trips=None):
+    #pdb.set_trace()
+    if bulk_dom:
+        return get_table_links_bulk(browser,table_xpath,round_trips)
+
+    table = SeleniumScrappingUtils.get_page_element(browser,table_xpath)
+    elements_list = table.find_elements(By.CSS_SELECTOR,"a")
+    links = [element.get_attribute("href") for element in elements_list]
+    rows = table.find_elements(By.CSS_SELECTOR,"tr")
+    tender_ids = [row.find_element("xpath","td[2]").text for row in rows[1:-2]]
+    try:
+        next_page_link = table.find_elements("xpath",'//*[@id="loadNext"]')[0].get_attribute("href")
+    except:
+        next_page_link = ''
+    return table,links,next_page_link,tender_ids
+
+def get_table_links_bulk(browser,table_xpath,round_trips=None):
+    '''
+    get_table_links reading the listing from one page_source call instead of one call per cell
+    '''
+    table = SeleniumScrappingUtils.get_page_element(browser,table_xpath)
+    document = SeleniumScrappingUtils.get_page_document(browser)
+    current_url = browser.current_url
+    table_html = document.xpath(table_xpath)[0]
+    elements_list = table_html.xpath(".//a")
+    links = [urljoin(current_url,element.get("href")) if element.get("href") is not None else None for element in elements_list]
+    rows = table_html.xpath(".//tr")
+    tender_ids = [HtmlScrappingUtils.get_text_from_element(row.xpath("td[2]")[0]) for row in rows[1:-2]]
+    next_page_elements = document.xpath('//*[@id="loadNext"]')
+    next_page_link = urljoin(current_url,next_page_elements[0].get("href")) if next_page_elements else ''
+    if round_trips is not None:
+        #get_table_links: the table, its links and their hrefs, its rows and their tender ids, the next page link and its href
+        element_round_trips = 1 + 1 + len(elements_list) + 1 + 2*len(rows[1:-2]) + 1 + len(next_page_elements[:1])
+        #the table, page_source and current_url
+        round_trips['webdriver_calls'] += 3
+        round_trips['round_trips_saved'] += element_round_trips - 3
+    return table,links,next_page_link,tender_ids
+
+def extract_more_details_sections(document,tender_status_id,round_trips=None):
+    '''
+    Sections of a parsed "View More Details" page in one frame. round_trips counts the
+    WebDriver calls the element by element extraction would have made on the page
+    '''
+    tables = document.xpath('/html/body/table/tbody/tr/td/table/tbody/tr[4]/td/table/tbody/tr/td/table/tbody/tr/td/table')[0].xpath(".//table")
+    element_round_trips = 1
+    dict_table_section_head = {}
+    for table_section_elements in tables:
+        section_heads = HtmlScrappingUtils.find_elements_by_class(table_section_elements,"section_head")
+        element_round_trips += 1
+        if section_heads:
+            element_round_trips += 1
+            dict_table_section_head[HtmlScrappingUtils.get_text_from_element(section_heads[0])] = table_section_elements
+    section_frames = []
+    for index, (keys, values) in enumerate(dict_table_section_head.items()):
+        keys = keys.replace("/","")
+        if keys == "Tender Documents":
+            continue
+        elif (keys.startswith("Cover Details") or keys == "Latest Corrigendum List" or keys.startswith("Other")):
+            records = HtmlScrappingUtils.extract_vertical_records(values,1)
+            element_round_trips += HtmlScrappingUtils.vertical_table_round_trips(values,1)
+        elif keys == "Payment Instruments":
+            table_section = values.xpath(".//table")[0]
+            records = HtmlScrappingUtils.extract_vertical_records(table_section,1)
+            element_round_trips += 1 + HtmlScrappingUtils.vertical_table_round_trips(table_section,1)
+        else:
+            records = HtmlScrappingUtils.extract_horizontal_records(values,1)
+            element_round_trips += HtmlScrappingUtils.horizontal_table_round_trips(values,1)
+        section_frames.append(SeleniumScrappingUtils.records_to_frame(records))
+    if round_trips is not None:
+        round_trips['webdriver_calls'] += 1
+        round_trips['round_trips_saved'] += element_round_trips - 1
+    return concatinate_sections(section_frames,tender_status_id)
+
+def extract_stage_summary_sections(document,dict_tables_type,tender_status_id,round_trips=None):
+    '''
+    Sections of a parsed stage summary page in one frame. round_trips counts the
+    WebDriver calls the element by element extraction would have made on the page
+    '''
+    list_of_dict_tables_type = list(dict_tables_type.keys())
+    sections = HtmlScrappingUtils.find_elements_by_class(document,"table_list")
+    sections += HtmlScrappingUtils.find_elements_by_class(document,"list_table")[:1]
+    element_round_trips = 2
+    section_frames = []
+    for index,name in enumerate(sections):
+        if index == 0:
+            records = HtmlScrappingUtils.extract_horizontal_records(name,0)
+            element_round_trips += HtmlScrappingUtils.horizontal_table_round_trips(name,0)
+        else:
+            header_name = HtmlScrappingUtils.get_text_from_element(HtmlScrappingUtils.find_elements_by_class(name,"section_head")[0])
+            element_round_trips += 2
+            if (header_name in list_of_dict_tables_type) & (dict_tables_type[header_name] == "Vertical"):
+                records = HtmlScrappingUtils.extract_vertical_records(name,1)
+                element_round_trips += HtmlScrappingUtils.vertical_table_round_trips(name,1)
+            else:
+                records = HtmlScrappingUtils.extract_horizontal_records(name,1)
+                element_round_trips += HtmlScrappingUtils.horizontal_table_round_trips(name,1)
+        section_frames.append(SeleniumScrappingUtils.records_to_frame(records))
+    if round_trips is not None:
+        round_trips['webdriver_calls'] += 1
+        round_trips['round_trips_saved'] += element_round_trips - 1
+    return concatinate_sections(section_frames,tender_status_id)
+
+def concatinate_sections(section_frames,tender_status_id):
+    '''
+    Puts the sections of a page side by side in one frame, None if the page had no sections
+    '''
+    section_frames = [frame for frame in section_frames if frame is not None]
+    if not section_frames:
+        return None
+    combined_frame = SeleniumScrappingUtils.concatinate_frames(section_frames,dict_tender_status[tender_status_id])
+    return SeleniumScrappingUtils.reread_frame(combined_frame)
+
+def build_final_frame(tender_id,details_frame,summary_frame,tender_status_id):
+    '''
+    The details and stage summary of a tender as one row
+    '''
+    frames = [frame for frame in [details_frame,summary_frame] if frame is not None]
+    if not frames:
+        raise ValueError("No sections found for tender {}".format(tender_id))
+    return SeleniumScrappingUtils.concatinate_frames(frames,dict_tender_status[tender_status_id])
+
+def save_tender(folder,tender_id,details_frame,summary_frame,tender_status_id):
+    '''
+    Writes the details and stage summary of a tender as one row to folder/final_<tender_id>.csv
+    '''
+    final_frame = build_final_frame(tender_id,details_frame,summary_frame,tender_status_id)
+    final_frame.to_csv(os.path.join(folder,"final_"+tender_id+".csv"), index=False, encoding='utf-8-sig')
+
+def store_tender(folder,tender_id,details_frame,summary_frame,tender_status_id,checkpoint=None,store=None):
+    '''
+    Adds the tender to the store, which marks it completed once its batch is written, or
+    without a store saves folder/final_<tender_id>.csv and marks it completed right away
+    '''
+    if store is not None:
+        store.add(tender_id,build_final_frame(tender_id,details_frame,summary_frame,tender_status_id))
+        return
+    save_tender(folder,tender_id,details_frame,summary_frame,tender_status_id)
+    if checkpoint is not None:
+        checkpoint.mark_completed(tender_id)
+
+def scrapeTender(browser,tender_ids,links,dict_tables_type,folder,tender_status_id,flag=None,bulk_dom=False,checkpoint=None,retry_queue=None,metrics=None,recorder=None,store=None):
+    '''
+    Scrapes the details and the stage summary of every tender and writes them to the store,
+    or to folder/final_<tender_id>.csv. With bulk_dom every page is read in one WebDriver call.
+    Saved tenders are marked completed in the checkpoint. A tender whose page, window or
+    tables time out (RETRYABLE_ERRORS) is appended to retry_queue, or raises without one.
+    The recorder saves the pages of the tender
+    '''
+    metrics = metrics if metrics is not None else ScraperMetrics()
+    #pdb.set_trace()
+    if (len(tender_ids) == 10)&(len(links)==10):
+        pass
+    else:
+        links = links[:len(tender_ids)]
+    #pdb.set_trace()
+    main_window = browser.current_window_handle
+    for index,link in enumerate(links):
+        round_trips = Counter()
         try:
-            SeleniumScrappingUtils.concatinate_csvs(path_to_save,"summary"+"_"+tender_id, dict_tender_status[tender_status_id])
-        except:
-            pass
+            with metrics.timer("tender_page",tender_ids[index]):
+                browser.get(link)
+            if recorder is not None:
+                recorder.record_page("tender",tender_ids[index],browser.page_source)
+            with metrics.timer("detail",tender_ids[index]):
+                details_frame = scrape_view_more_details(browser,tender_ids[index],tender_status_id,bulk_dom,round_trips,recorder)
+            with metrics.timer("stage_summary",tender_ids[index]):
+                summary_frame = scrape_view_stage_summary(browser,tender_ids[index],dict_tables_type,tender_status_id,bulk_dom,round_trips,recorder)
+        except RETRYABLE_ERRORS as e:
+            metrics.count("timeouts")
+            SeleniumScrappingUtils.return_to_window(browser,main_window)
+            if retry_queue is None:
+                raise
+            print("{}: {}, will retry".format(tender_ids[index],e))
+            retry_queue.append((tender_ids[index],link))
+            continue
+        with metrics.timer("write",tender_ids[index]):
+            store_tender(folder,tender_ids[index],details_frame,summary_frame,tender_status_id,checkpoint,store)
+        metrics.count("tenders_scraped")
+        metrics.count("webdriver_round_trips_saved",round_trips['round_trips_saved'])
+        if bulk_dom:
+            print("{}: {} WebDriver round-trips saved".format(tender_ids[index],round_trips['round_trips_saved']))
+    # SeleniumScrappingUtils.get_page_element(browser,'//*[@id="PageLink_20"]').click()
+
+def scrape_view_more_details_over_http(session,tender_id,details_link,tender_status_id):
+    '''
+    scrape_view_more_details for a page fetched with the requests session
+    '''
+    document = HtmlScrappingUtils.get_html_page(session,details_link)
+    return extract_more_details_sections(document,tender_status_id)
 
+def scrape_view_stage_summary_over_http(session,tender_id,summary_link,dict_tables_type,tender_status_id):
+    '''
+    scrape_view_stage_summary for a page fetched with the requests session
+    '''
+    document = HtmlScrappingUtils.get_html_page(session,summary_link)
+    return extract_stage_summary_sections(document,dict_tables_type,tender_status_id)
 
-        
-    def get_table_links(browser,table_xpath):
-        #pdb.set_trace()
+def scrapeTender_over_http(session,tender_ids,links,dict_tables_type,folder,tender_status_id,checkpoint=None,metrics=None,store=None,retry_queue=None):
+    '''
+    scrapeTender without the browser: the tender, "View More Details" (DirectLink) and
+    stage summary (DirectLink_0) pages are fetched with a requests session holding the
+    cookies of the browser that passed the captcha. A tender whose requests fail or time
+    out is appended to retry_queue, or raises without one
+    '''
+    metrics = metrics if metrics is not None else ScraperMetrics()
+    for tender_id,link in zip(tender_ids,links):
+        try:
+            with metrics.timer("tender_page",tender_id):
+                tender_page = HtmlScrappingUtils.get_html_page(session,link)
+            details_link = HtmlScrappingUtils.get_link(tender_page,link,"DirectLink")
+            summary_link = HtmlScrappingUtils.get_link(tender_page,link,"DirectLink_0")
+            with metrics.timer("detail",tender_id):
+                details_frame = scrape_view_more_details_over_http(session,tender_id,details_link,tender_status_id)
+            with metrics.timer("stage_summary",tender_id):
+                summary_frame = scrape_view_stage_summary_over_http(session,tender_id,summary_link,dict_tables_type,tender_status_id)
+        except RETRYABLE_ERRORS as e:
+            metrics.count("timeouts")
+            if retry_queue is None:
+                raise
+            print("{}: {}, will retry".format(tender_id,e))
+            retry_queue.append((tender_id,link))
+            continue
+        metrics.count("http_requests",3)
+        with metrics.timer("write",tender_id):
+            store_tender(folder,tender_id,details_frame,summary_frame,tender_status_id,checkpoint,store)
+        metrics.count("tenders_scraped")
+
+def get_browser_session(browser,pool_size=10):
+    '''
+    requests session carrying the cookies and user agent of the browser
+    '''
+    user_agent = browser.execute_script("return navigator.userAgent")
+    return HtmlScrappingUtils.get_requests_session(browser.get_cookies(),user_agent,pool_size)
+
+def open_worker_browser(cookies,metrics=None):
+    '''
+    Opens a browser sharing the search session (cookies) of the main browser, so the
+    tender links of the listing open without solving the captcha again
+    '''
+    worker_browser = webdriver.Firefox(service=service, options=firefox_options)
+    if metrics is not None:
+        metrics.instrument_browser(worker_browser)
+        metrics.count("browser_launches")
+    worker_browser.get(url)
+    for cookie in cookies:
+        worker_browser.add_cookie(cookie)
+    return worker_browser
+
+def scrape_worker(worker_id,tender_queue,cookies,folder,tender_status_id,user_agent=None,bulk_dom=False,checkpoint=None,retry_queue=None,metrics=None,store=None):
+    '''
+    Scrapes tenders pulled from the shared queue until the pager sends None. With a
+    user_agent the worker fetches the pages over http instead of opening a browser.
+    Tenders that time out go to retry_queue
+    '''
+    if user_agent:
+        worker_session = HtmlScrappingUtils.get_requests_session(cookies,user_agent)
+    else:
+        worker_browser = open_worker_browser(cookies,metrics)
+    try:
+        while True:
+            tender = tender_queue.get()
+            if tender is None:
+                tender_queue.task_done()
+                break
+            tender_id,link = tender
+            try:
+                if user_agent:
+                    scrapeTender_over_http(worker_session,[tender_id],[link],dict_tables_type,folder,tender_status_id,checkpoint,metrics,store,retry_queue)
+                else:
+                    scrapeTender(worker_browser,[tender_id],[link],dict_tables_type,folder,tender_status_id,bulk_dom=bulk_dom,checkpoint=checkpoint,retry_queue=retry_queue,metrics=metrics,store=store)
+            except Exception as e:
+                if metrics is not None:
+                    metrics.count("worker_errors")
+                print("Worker {}: error scraping {}: {}".format(worker_id,tender_id,e))
+            finally:
+                tender_queue.task_done()
+    finally:
+        if user_agent:
+            worker_session.close()
+        else:
+            worker_browser.quit()
 
-        table = SeleniumScrappingUtils.get_page_element(browser,table_xpath)
-        elements_list = table.find_elements(By.CSS_SELECTOR,"a")
-        links = [element.get_attribute("href") for element in elements_list]
-        rows = table.find_elements(By.CSS_SELECTOR,"tr")
-        tender_ids = [row.find_element("xpath","td[2]").text for row in rows[1:-2]]
+def put_tender(tender_queue,tender,workers):
+    '''
+    Blocks until a worker has room for the tender, fails if every worker has stopped
+    '''
+    while True:
         try:
-            next_page_link = table.find_elements("xpath",'//*[@id="loadNext"]')[0].get_attribute("href")
-        except:
-            next_page_link = ''
-        return table,links,next_page_link,tender_ids
-
-    def scrapeTender(browser,tender_ids,links,dict_tables_type,flag=None,):
-        #pdb.set_trace()
-        if (len(tender_ids) == 10)&(len(links)==10):
-            pass
+            tender_queue.put(tender,timeout=5)
+            return
+        except queue.Full:
+            if not any(worker.is_alive() for worker in workers):
+                raise RuntimeError("All scraping workers have stopped")
+
+def wait_for_queue(tender_queue,workers):
+    '''
+    Blocks until the workers have finished every queued tender, fails if every worker has stopped
+    '''
+    with tender_queue.all_tasks_done:
+        while tender_queue.unfinished_tasks:
+            if not any(worker.is_alive() for worker in workers):
+                raise RuntimeError("All scraping workers have stopped")
+            tender_queue.all_tasks_done.wait(timeout=5)
+
+def retry_timed_out_tenders(retry_queue,scrape_page,wait=None,metrics=None):
+    '''
+    Calls scrape_page again with the tenders that timed out, for up to MAX_RELOADS rounds.
+    wait blocks until the tenders handed to scrape_page are done (for the worker pool).
+    Tenders still failing stay pending in the checkpoint for the next run
+    '''
+    for attempt in range(MAX_RELOADS):
+        if wait is not None:
+            wait()
+        if not retry_queue:
+            return
+        tenders = retry_queue[:]
+        del retry_queue[:]
+        print("Retrying {} tenders that timed out, attempt {} of {}".format(len(tenders),attempt+1,MAX_RELOADS))
+        if metrics is not None:
+            metrics.count("tender_retries",len(tenders))
+        scrape_page([tender_id for tender_id,link in tenders],[link for tender_id,link in tenders])
+    if wait is not None:
+        wait()
+    if retry_queue:
+        print("Gave up on {}".format(", ".join(tender_id for tender_id,link in retry_queue)))
+
+def go_to_checkpoint_page(browser,checkpoint,bulk_dom=False,round_trips=None):
+    '''
+    Opens the first listing page the checkpoint has not finished. When the saved link does
+    not load in this session, pages forward from the first page instead. round_trips counts
+    the WebDriver calls of the listing pages read, as get_table_links does
+    '''
+    if checkpoint.page_index == 0:
+        return get_table_links(browser,'//*[@id="tabList"]',bulk_dom,round_trips)
+    print("Resuming from page {}".format(checkpoint.page_index))
+    try:
+        browser.get(checkpoint.next_page_link)
+        return get_table_links(browser,'//*[@id="tabList"]',bulk_dom,round_trips)
+    except Exception:
+        print("Saved page link did not load, paging forward to page {}".format(checkpoint.page_index))
+    browser.back()
+    table,links,next_page_link,tender_ids = get_table_links(browser,'//*[@id="tabList"]',bulk_dom,round_trips)
+    for page_index in range(checkpoint.page_index):
+        browser.get(next_page_link)
+        table,links,next_page_link,tender_ids = get_table_links(browser,'//*[@id="tabList"]',bulk_dom,round_trips)
+    return table,links,next_page_link,tender_ids
+
+def page_through_listing(browser,checkpoint,scrape_page,bulk_dom=False,metrics=None,recorder=None):
+    '''
+    Walks the listing from the checkpoint page and calls scrape_page(tender_ids,links)
+    with the tenders of every page that are not scraped yet. The recorder saves the pages
+    '''
+    metrics = metrics if metrics is not None else ScraperMetrics()
+    page_index = checkpoint.page_index
+    round_trips = Counter()
+    with metrics.timer("listing",page_index=page_index):
+        table,links,next_page_link,tender_ids = go_to_checkpoint_page(browser,checkpoint,bulk_dom,round_trips)
+    metrics.count("webdriver_round_trips_saved",round_trips['round_trips_saved'])
+    while True:
+        links = links[:len(tender_ids)]
+        if recorder is not None:
+            recorder.record_listing(browser.page_source,tender_ids)
+        checkpoint.start_page(page_index,next_page_link,tender_ids)
+        pending = [(tender_id,link) for tender_id,link in zip(tender_ids,links) if not checkpoint.is_completed(tender_id)]
+        if pending:
+            scrape_page([tender_id for tender_id,link in pending],[link for tender_id,link in pending])
+        if not len(next_page_link):
+            break
+        print("next")
+        page_index += 1
+        round_trips = Counter()
+        with metrics.timer("listing",page_index=page_index):
+            browser.get(next_page_link)
+            table,links,next_page_link,tender_ids = get_table_links(browser,'//*[@id="tabList"]',bulk_dom,round_trips)
+        metrics.count("webdriver_round_trips_saved",round_trips['round_trips_saved'])
+
+def scrape_with_worker_pool(browser,folder,tender_status_id,number_of_workers,checkpoint,http_details=False,bulk_dom=False,metrics=None,store=None):
+    '''
+    Pages through the listing with the main browser and hands every tender link to
+    number_of_workers headless browsers (or http sessions) through one shared queue
+    '''
+    cookies = browser.get_cookies()
+    user_agent = browser.execute_script("return navigator.userAgent") if http_details else None
+    tender_queue = queue.Queue(maxsize=number_of_workers*10)
+    retry_queue = []
+    workers = [threading.Thread(target=scrape_worker,args=(worker_id,tender_queue,cookies,folder,tender_status_id,user_agent,bulk_dom,checkpoint,retry_queue,metrics,store))
+               for worker_id in range(number_of_workers)]
+    def queue_page(tender_ids,links):
+        for tender_id,link in zip(tender_ids,links):
+            put_tender(tender_queue,(tender_id,link),workers)
+    for worker in workers:
+        worker.start()
+    try:
+        page_through_listing(browser,checkpoint,queue_page,bulk_dom,metrics)
+        retry_timed_out_tenders(retry_queue,queue_page,lambda: wait_for_queue(tender_queue,workers),metrics)
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                put_tender(tender_queue,None,workers)
+        for worker in workers:
+            worker.join()
+
+def search_date_range(month):
+    '''
+    Date picker values covering a month: (month_start, month_end, date_end), months count from 0
+    '''
+    month_start = str(int(month)-1)
+    month_end = str(int(month)-1)
+    if month_end in ['0','2','4','6','7','9','11']:
+        date_end = '31'
+    elif month_end=='1':
+        date_end='28'
+    else:
+        date_end = '30'
+    return month_start,month_end,date_end
+
+def months_until(year,month,until=None):
+    '''
+    (year, month) from the given month to until ("YYYY-MM", included), or just the given month
+    '''
+    months = [(int(year),int(month))]
+    if until:
+        last_month = tuple(int(part) for part in until.split('-'))
+        while months[-1] < last_month:
+            year,month = months[-1]
+            months.append((year+1,1) if month == 12 else (year,month+1))
+    return months
+
+def search_tenders(browser,tender_status_id,year,month,solver="manual",metrics=None):
+    '''
+    Loads the search form in the browser and submits it for a tender status and month. The
+    captcha is solved only when the form shows one, so an open session can search again
+    without it. Returns True if a captcha was solved
+    '''
+    metrics = metrics if metrics is not None else ScraperMetrics()
+    month_start,month_end,date_end = search_date_range(month)
+    with metrics.timer("search_form"):
+        browser.get(url)
+        select_search_filters(browser,tender_status_id,str(year),month_start,month_end,date_end)
+    if not browser.find_elements(By.ID,"captchaImage"):
+        browser.find_element(By.ID,"Search").click()
+        if not (browser.find_elements(By.CLASS_NAME,"error") and browser.find_elements(By.ID,"captchaImage")):
+            return False
+        #the portal asked for the captcha after all
+    with metrics.timer("captcha"):
+        attempts = captcha_input(browser,'//*[@id="captchaImage"]','//*[@id="captchaText"]',solver)
+    metrics.count("captchas_solved")
+    metrics.count("captcha_attempts",attempts)
+    return True
+
+def scrape_tender_status(browser,folder,tender_status_id,checkpoint,args,metrics=None,recorder=None):
+    '''
+    Scrapes the listing the browser is showing with the mode picked on the command line.
+    The recorder only works with the serial browser mode
+    '''
+    store = TenderStore(folder,checkpoint) if args.sink == "sqlite" else None
+    try:
+        if args.workers > 1:
+            scrape_with_worker_pool(browser,folder,tender_status_id,args.workers,checkpoint,args.http_details,args.bulk_dom,metrics,store)
+        elif args.http_details:
+            session = get_browser_session(browser)
+            retry_queue = []
+            scrape_page = lambda tender_ids,links: scrapeTender_over_http(session,tender_ids,links,dict_tables_type,folder,tender_status_id,checkpoint,metrics,store,retry_queue)
+            page_through_listing(browser,checkpoint,scrape_page,args.bulk_dom,metrics)
+            retry_timed_out_tenders(retry_queue,scrape_page,metrics=metrics)
+            session.close()
         else:
-            links = links[:len(tender_ids)]
-        #pdb.set_trace()
-        for index,link in enumerate(links):
-            browser.get(link)
-            scrape_view_more_details(browser,tender_ids[index])
-            scrape_view_stage_summary(browser,tender_ids[index],dict_tables_type)
-
-            os.chdir("concatinated_csvs/")
-            SeleniumScrappingUtils.concatinate_csvs("../{}/".format(folder),"final_"+tender_ids[index], dict_tender_status[tender_status_id])
-            directory = os.getcwd()
-            SeleniumScrappingUtils.remove_csvs(directory)
-            os.chdir("../")
-            directory = os.getcwd()
-            SeleniumScrappingUtils.remove_csvs(directory)
-        # SeleniumScrappingUtils.get_page_element(browser,'//*[@id="PageLink_20"]').click()
-
-    if __name__ == "__main__":
-            tender_ids_list = []
-            table,links,next_page_link,tender_ids = get_table_links(browser,'//*[@id="tabList"]')
-            scrapeTender(browser,tender_ids,links,dict_tables_type,"first")
-            # try:
-            #     scrapeTender(browser,tender_ids,links,dict_tables_type,"first")
-            # except:
-            #     print('Error1')
-            #     pdb.set_trace()
-            #     pass
-            while len(next_page_link):
-                print("next")
-                browser.get(next_page_link)
-                table,links,next_page_link,tender_ids = get_table_links(browser,'//*[@id="tabList"]')
-                scrapeTender(browser,tender_ids,links,dict_tables_type)
-                # try:
-                #     scrapeTender(browser,tender_ids,links,dict_tables_type)
-                # except:
-                #     print('Error2')
-                #     pdb.set_trace()
-                #     pass
-            browser.quit()
\ No newline at end of file
+            retry_queue = []
+            scrape_page = lambda tender_ids,links: scrapeTender(browser,tender_ids,links,dict_tables_type,folder,tender_status_id,bulk_dom=args.bulk_dom,checkpoint=checkpoint,retry_queue=retry_queue,metrics=metrics,recorder=recorder,store=store)
+            page_through_listing(browser,checkpoint,scrape_page,args.bulk_dom,metrics,recorder)
+            retry_timed_out_tenders(retry_queue,scrape_page,metrics=metrics)
+    finally:
+        if store is not None:
+            #tenders scraped before a failure are complete, keep them
+            store.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrapes the Tender Status section of assamtenders.gov.in for a month")
+    parser.add_argument("year")
+    parser.add_argument("month")
+    parser.add_argument("--workers",type=int,default=1,
+                        help="number of headless browser sessions scraping tender details in parallel")
+    parser.add_argument("--http-details",action="store_true",
+                        help="use the browser only for the captcha and fetch the tender pages with requests")
+    parser.add_argument("--bulk-dom",action="store_true",
+                        help="read every page with one WebDriver call and parse its tables locally")
+    parser.add_argument("--captcha",choices=["manual","ocr"],default="manual",
+                        help="type the captcha in, or read it with tesseract (falls back to typing after {} misses)".format(OCR_ATTEMPTS))
+    parser.add_argument("--statuses",nargs="+",choices=list(dict_tender_status.keys()),default=['6'],
+                        help="tender status ids to scrape, AOC (6) by default")
+    parser.add_argument("--until",
+                        help="last month to scrape (YYYY-MM), scrapes every month from year month to it")
+    parser.add_argument("--reuse-session",action="store_true",
+                        help="keep one browser open for every status and month, solving the captcha only when asked")
+    parser.add_argument("--record-dir",
+                        help="save the pages of the first --record-pages listing pages and their tenders here, for replay_portal.py")
+    parser.add_argument("--record-pages",type=int,default=2)
+    parser.add_argument("--sink",choices=["sqlite","csv"],default="sqlite",
+                        help="save the tenders of a month to scraped_recent_tenders/<YYYY_MM>/tenders.sqlite, or a final_<tender id>.csv each")
+    parser.add_argument("--rescrape",action="store_true",
+                        help="ignore the checkpoint and the tenders already saved, scrape every tender of the month again")
+    args = parser.parse_args()
+    if args.record_dir and (args.workers > 1 or args.http_details):
+        parser.error("--record-dir records the pages the main browser opens, it can't be used with --workers or --http-details")
+    recorder = PageRecorder(args.record_dir,args.record_pages) if args.record_dir else None
+
+    print(os.getcwd())
+    print(url)
+    print(firefox_options)
+
+    browser = None
+    browser_launches = 0
+    captcha_solves = 0
+    try:
+        for year,month in months_until(args.year,args.month,args.until):
+            folder = month_folder(year,month)
+            os.makedirs(folder,exist_ok=True)
+
+            #Select tender status
+            for tender_status_id in args.statuses:
+                print('{}_{:02d} tenderStatusid: '.format(year,month), dict_tender_status[tender_status_id])
+                checkpoint = ScrapeCheckpoint(folder,tender_status_id,args.rescrape)
+                if checkpoint.page_index > 0 and not len(checkpoint.next_page_link):
+                    print("Already scraped, pass --rescrape to scrape again")
+                    continue
+                metrics = ScraperMetrics("{}_{:02d}_status{}".format(year,month,tender_status_id))
+                try:
+                    if browser is None:
+                        browser = webdriver.Firefox(service=service, options=firefox_options)
+                        browser_launches += 1
+                        metrics.count("browser_launches")
+                    metrics.instrument_browser(browser)
+
+                    #break captcha
+                    captcha_solves += search_tenders(browser,tender_status_id,year,month,args.captcha,metrics)
+
+                    scrape_tender_status(browser,folder,tender_status_id,checkpoint,args,metrics,recorder)
+                finally:
+                    metrics.save(os.path.join(folder,"metrics_{}".format(tender_status_id)))
+                if not args.reuse_session:
+                    browser.quit()
+                    browser = None
+    finally:
+        if browser is not None:
+            browser.quit()
+    print("Browser launches: {}, captchas solved: {}".format(browser_launches,captcha_solves))
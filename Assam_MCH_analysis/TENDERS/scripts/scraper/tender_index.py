@@ -0,0 +1,60 @@
+# Index of the months every tender was scraped in, to keep one copy of a tender across months
+import json
+import os
+import tender_schema
+
+INDEX_NAME = "tender_index.json"
+
+class TenderIndex(object):
+    '''
+    Keeps, for every Tender ID, the months it is in with the stage and time it was scraped
+    there, and the month whose copy is kept: the most advanced stage (tender_schema.stage_rank),
+    then the latest scrape, then the latest month. A month's tenders are replaced when the
+    month is rebuilt, so only the tenders of that month are looked at again.
+    Saved to <data_path>/tender_index.json, with the kept month of every tender under "kept"
+    '''
+    def __init__(self, data_path):
+        self.path = os.path.join(data_path, INDEX_NAME)
+        self.tenders = {}
+        self.month_tenders = {}
+        self.loaded = os.path.exists(self.path)
+        if self.loaded:
+            with open(self.path, encoding="utf-8") as index:
+                self.tenders = json.load(index)["tenders"]
+        for tender_id, months in self.tenders.items():
+            for month in months:
+                self.month_tenders.setdefault(month, set()).add(tender_id)
+
+    def replace_month(self, month, entries):
+        '''
+        entries is [(tender_id, tender_stage, scraped_at)] of every tender of the month
+        '''
+        for tender_id in self.month_tenders.pop(month, set()):
+            months = self.tenders[tender_id]
+            del months[month]
+            if not months:
+                del self.tenders[tender_id]
+        for tender_id, stage, scraped_at in entries:
+            self.tenders.setdefault(tender_id, {})[month] = [tender_schema.stage_rank(stage), scraped_at or '']
+            self.month_tenders.setdefault(month, set()).add(tender_id)
+
+    def forget_missing(self, months):
+        for month in set(self.month_tenders) - set(months):
+            self.replace_month(month, [])
+
+    def kept_month(self, tender_id):
+        months = self.tenders[tender_id]
+        return max(months, key=lambda month: (months[month][0], months[month][1], month))
+
+    def duplicates(self):
+        '''
+        Number of tenders in more than one month
+        '''
+        return sum(1 for months in self.tenders.values() if len(months) > 1)
+
+    def save(self):
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as index:
+            json.dump({"tenders": self.tenders,
+                       "kept": {tender_id: self.kept_month(tender_id) for tender_id in self.tenders}}, index)
+        os.replace(temporary_path, self.path)
@@ -0,0 +1,143 @@
+# Canonical columns of the monthly tenders and the raw headers of the scraped tender pages they come from
+import re
+from functools import lru_cache
+import pandas as pd
+
+# (column in monthly_tenders, raw headers from the most to the least preferred, dtype)
+TENDER_COLUMNS = [
+    ('Tender ID', ['Tender ID', 'Tender ID :'], 'string'),
+    ('tender_externalreference', ['Tender Reference Number', 'Tender Ref No :', 'Tender Ref No'], 'string'),
+    ('tender_title', ['Title', 'Tender Title :'], 'string'),
+    ('Work Description', ['Work Description'], 'string'),
+    ('Tender Category', ['Tender Category'], 'string'),
+    ('Tender Type', ['Tender Type'], 'string'),
+    ('Form of contract', ['Form of contract'], 'string'),
+    ('Product Category', ['Product Category'], 'string'),
+    ('Is Multi Currency Allowed For BOQ', ['Is Multi Currency Allowed For BOQ'], 'string'),
+    ('Allow Two Stage Bidding', ['Allow Two Stage Bidding'], 'string'),
+    ('Independent External Monitor/Remarks', ['Independent External Monitor/Remarks'], 'string'),
+    ('Published Date', ['Publish Date'], 'string'),
+    ('Pre Bid Meeting Date', ['Pre Bid Meeting Date'], 'string'),
+    ('Bid Validity(Days)', ['Bid Validity(Days)'], 'float'),
+    ('Should Allow NDA Tender', ['Should Allow NDA Tender'], 'string'),
+    ('Allow Preferential Bidder', ['Allow Preferential Bidder'], 'string'),
+    ('Payment Mode', ['Payment Mode'], 'string'),
+    ('Bid Opening Date', ['Bid Opening Date'], 'string'),
+    ('Organisation Chain', ['Organisation Chain', 'Organisation Chain :'], 'string'),
+    ('location', ['Location'], 'string'),
+    ('Pincode', ['Pincode'], 'float'),
+    ('No of Bids Received', ['No. of Covers'], 'float'),
+    ('Tender Value in ₹', ['Tender Value in ₹'], 'string'),
+    ('Bidder Name', ['Bidder Name'], 'string'),
+    ('Awarded Value', ['Awarded Value'], 'amount'),
+    ('Status', ['Status'], 'string'),
+    ('Contract Date :', ['Contract Date :'], 'string'),
+    ('Tender Stage', ['Tender Stage'], 'string'),
+]
+COLUMN_NAMES = [column for column, raw_headers, dtype in TENDER_COLUMNS]
+
+# raw headers of the tender pages that are known but not kept
+OTHER_HEADERS = {
+    'AOC Description :', 'AOC document :', 'Address', 'Allow Two Stage Bidding', 'Auction Initiated Status :',
+    'Awarded Currency', 'BOQ Comparative Chart :', 'Bank Name', 'Bid Number', 'Bid Opening Place',
+    'Bid Submission Closing Date', 'Bid Submission End Date', 'Bid Submission Opening Date', 'Bid Submission Start Date',
+    'Category', 'Clarification End Date', 'Clarification Start Date', 'Committee Chairperson/Co-ordinator Name :',
+    'Committee Chairperson/Co-ordinator Type :', 'Committee Members :', 'Contract Type', 'Contract Value :',
+    'Conversion rate in ₹', 'Corrigendum Title', 'Corrigendum Type', 'Cover', 'Cover No', 'Description',
+    'Document :', 'Document Download / Sale End Date', 'Document Download / Sale Start Date', 'Document Name',
+    'Document Size(in KB)', 'Document Type', 'EMD Amount in ₹', 'EMD Exemption Allowed', 'EMD Fee Type',
+    'EMD Payable At', 'EMD Payable To', 'EMD Percentage', 'EMD through BG/ST or EMD Exemption Allowed',
+    'Expected Value', 'Fee Payable At', 'Fee Payable To', 'Financial Bid Opening Date', 'Financial Bid Opening Date:',
+    'Format/File', 'General Technical Evaluation Allowed', 'Instrument Type', 'Is Multi Currency Allowed For Fee',
+    'ItemWise Technical Evaluation Allowed', 'Name', 'Period Of Work(Days)', 'Points(Weightage)', 'Pre Bid Meeting Address',
+    'Pre Bid Meeting Place', 'Pre Qualification Details', 'Processing Fee in ₹', 'Published Date', 'QCBS Comparative Chart :',
+    'Rank', 'Reason :', 'Remarks', 'Revocated To', 'Revocation Description', 'Revocation Title', 'S.No', 'Status Updated On',
+    'Sub Category', 'Sub Category Description', 'Sub category', 'Submitted Date', 'Summary :', 'Tender Fee Exemption Allowed',
+    'Tender Fee in ₹', 'Type :', 'Updated By :', 'Updated On :', 'Updated on :', 'Value', 'View',
+    'Withdrawal Allowed', 'Work Completion Period in days :',
+}
+KNOWN_HEADERS = OTHER_HEADERS | set(raw_header for column, raw_headers, dtype in TENDER_COLUMNS for raw_header in raw_headers)
+
+# tender status ids of the portal's search form, and the Tender Stage their tenders are saved with
+TENDER_STATUS_STAGES = {'1': "To be Opened Tenders",
+                        '2': "Technical Bid Opening",
+                        '3': "Technical Evaluation",
+                        '4': "Financial Bid Opening",
+                        '5': "Financial Evaluation",
+                        '6': "AOC",
+                        '7': "Retender",
+                        '8': "Cancelled"}
+
+# tender stages (the tender status a tender was scraped under) from the least to the most advanced.
+# AOC comes last as it is the only stage with the awarded bid, a retendered or cancelled tender has none
+TENDER_STAGES = ['To be Opened Tenders', 'Technical Bid Opening', 'Technical Evaluation', 'Financial Bid Opening',
+                 'Financial Evaluation', 'Retender', 'Cancelled', 'AOC']
+
+# the strings read_csv reads as missing values
+NA_VALUES = {'', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+             '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'}
+
+def base_header(header):
+    '''
+    Header without the .1, .2 pandas adds to repeated headers
+    '''
+    return re.sub(r'(\.\d+)+$', '', header)
+
+def normalize_header(header):
+    '''
+    Header as compared when there is no exact match: no spaces around it, no trailing ":", any case
+    '''
+    return header.strip().rstrip(':').strip().lower()
+
+def stage_rank(stage):
+    '''
+    Position of a tender stage in TENDER_STAGES, from 1. 0 for a missing or unknown stage
+    '''
+    return TENDER_STAGES.index(stage) + 1 if stage in TENDER_STAGES else 0
+
+def resolve_columns(header):
+    '''
+    Position in a raw header of each canonical column: the first header equal to its most
+    preferred raw header, else to the next one, else equal to one of them after normalize_header.
+    Returns ({column: position}, (unknown headers)). Most tenders of a month share a header,
+    so headers are only resolved once
+    '''
+    return resolve_header(tuple(header))
+
+@lru_cache(maxsize=1024)
+def resolve_header(header):
+    first_positions = {}
+    normalized_positions = {}
+    unknown_headers = []
+    for position, name in enumerate(header):
+        first_positions.setdefault(name, position)
+        normalized_positions.setdefault(normalize_header(name), position)
+        if base_header(name) not in KNOWN_HEADERS:
+            unknown_headers.append(name)
+    positions = {}
+    for column, raw_headers, dtype in TENDER_COLUMNS:
+        found = [first_positions[raw_header] for raw_header in raw_headers if raw_header in first_positions]
+        if not found:
+            found = [normalized_positions[normalize_header(raw_header)] for raw_header in raw_headers
+                     if normalize_header(raw_header) in normalized_positions]
+        if found:
+            positions[column] = found[0]
+    return positions, tuple(unknown_headers)
+
+def to_dtype(values, dtype):
+    if dtype == 'float':
+        return pd.to_numeric(values).astype('float64')
+    if dtype == 'amount':
+        return pd.to_numeric(values.str.replace(',', '', regex=False)).astype('float64')
+    return values
+
+def typed_frame(records):
+    '''
+    Frame of records ({column: raw value}) with every canonical column, in order and with its
+    dtype. Columns no record has are left empty
+    '''
+    frame = pd.DataFrame.from_records(records, columns=COLUMN_NAMES)
+    for column, raw_headers, dtype in TENDER_COLUMNS:
+        values = frame[column].where(~frame[column].isin(NA_VALUES) & frame[column].notna()).astype(object)
+        frame[column] = to_dtype(values, dtype)
+    return frame
@@ -0,0 +1,150 @@
+# Per month store of the scraped tenders, one SQLite file instead of a final_<tender_id>.csv per tender
+import io
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+import pandas as pd
+
+STORE_NAME = "tenders.sqlite"
+BATCH_SIZE = 25
+
+class TenderStore(object):
+    '''
+    Keeps the rows of the tenders of a month in <folder>/tenders.sqlite. A tender is stored as
+    (tender_id, row, position, column_name, value) rows, so tenders with different headers share one
+    schema. Every row of the tender's final csv is kept: the first one has the tender's details, the
+    rows after it the extra bidders, corrigenda and payments of the multi-row sections. Column names
+    and values are the ones the final csv would have when read back.
+    Tenders are written in batches of batch_size, and only marked completed in the checkpoint
+    once their batch is committed: a tender lost with an unfinished batch gets scraped again
+    '''
+    def __init__(self, folder, checkpoint=None, batch_size=BATCH_SIZE):
+        self.path = TenderStore.path_for(folder)
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.pending = []
+        self.connection = TenderStore.connect(self.path)
+
+    def path_for(folder):
+        return os.path.join(folder, STORE_NAME)
+
+    def connect(path):
+        '''
+        Opens the store, creating its tables. Shards of the same month may write to it at once
+        '''
+        connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript('''
+            CREATE TABLE IF NOT EXISTS tenders (tender_id TEXT PRIMARY KEY, tender_stage TEXT, scraped_at TEXT);
+            CREATE TABLE IF NOT EXISTS tender_values (tender_id TEXT, row INTEGER, position INTEGER, column_name TEXT, value TEXT);
+            CREATE INDEX IF NOT EXISTS tender_values_tender_id ON tender_values (tender_id);
+        ''')
+        columns = [column[1] for column in connection.execute("PRAGMA table_info(tender_values)")]
+        if "row" not in columns:
+            # stores written before the row column only have the first row of every tender
+            with connection:
+                connection.execute("ALTER TABLE tender_values ADD COLUMN row INTEGER NOT NULL DEFAULT 0")
+        return connection
+
+    def connect_read_only(path):
+        '''
+        Opens the store for reading without writing to it, so reading a month does not change its
+        files for the raw manifest. Without a -wal file no writer has the store open, and it is opened
+        immutable: a plain read-only open would leave a -wal and -shm behind
+        '''
+        uri = "file:{}?mode=ro".format(urllib.request.pathname2url(os.path.abspath(path)))
+        if not os.path.exists(path + "-wal"):
+            uri += "&immutable=1"
+        return sqlite3.connect(uri, uri=True, timeout=60)
+
+    def add(self, tender_id, final_frame):
+        '''
+        Queues every row of the final frame of a tender, and writes the batch once it is full
+        '''
+        as_saved = pd.read_csv(io.StringIO(final_frame.to_csv(index=False)), dtype=str, keep_default_na=False)
+        values = [(tender_id, row, position, column_name, value if value != '' else None)
+                  for row, (index, saved_row) in enumerate(as_saved.iterrows())
+                  for position, (column_name, value) in enumerate(saved_row.items())]
+        stage = as_saved["Tender Stage"].iloc[0] if "Tender Stage" in as_saved.columns else None
+        with self.lock:
+            self.pending.append((tender_id, stage, values))
+            if len(self.pending) >= self.batch_size:
+                self.flush_pending()
+
+    def flush(self):
+        with self.lock:
+            self.flush_pending()
+
+    def flush_pending(self):
+        if not self.pending:
+            return
+        scraped_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with self.connection:
+            self.connection.executemany("DELETE FROM tender_values WHERE tender_id = ?",
+                                        [(tender_id,) for tender_id, stage, values in self.pending])
+            self.connection.executemany("INSERT OR REPLACE INTO tenders VALUES (?, ?, ?)",
+                                        [(tender_id, stage, scraped_at) for tender_id, stage, values in self.pending])
+            self.connection.executemany("INSERT INTO tender_values (tender_id, row, position, column_name, value) VALUES (?, ?, ?, ?, ?)",
+                                        [value for tender_id, stage, values in self.pending for value in values])
+        if self.checkpoint is not None:
+            for tender_id, stage, values in self.pending:
+                self.checkpoint.mark_completed(tender_id)
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def stored_tender_ids(folder, tender_stage=None):
+        '''
+        Ids of the tenders in the store of a month folder, only those saved with tender_stage if given
+        '''
+        path = TenderStore.path_for(folder)
+        if not os.path.exists(path):
+            return []
+        connection = TenderStore.connect_read_only(path)
+        try:
+            if tender_stage is None:
+                rows = connection.execute("SELECT tender_id FROM tenders")
+            else:
+                rows = connection.execute("SELECT tender_id FROM tenders WHERE tender_stage = ?", (tender_stage,))
+            return [tender_id for (tender_id,) in rows]
+        finally:
+            connection.close()
+
+    def scraped_times(folder):
+        '''
+        {tender_id: scraped_at} of the tenders in the store of a month folder
+        '''
+        path = TenderStore.path_for(folder)
+        if not os.path.exists(path):
+            return {}
+        connection = TenderStore.connect_read_only(path)
+        try:
+            return dict(connection.execute("SELECT tender_id, scraped_at FROM tenders"))
+        finally:
+            connection.close()
+
+    def read_tenders(folder):
+        '''
+        Every tender in the store of a month folder as the [(column_name, value)] of its first row,
+        in column order, like read_tender_file reads a final csv
+        '''
+        path = TenderStore.path_for(folder)
+        if not os.path.exists(path):
+            return []
+        connection = TenderStore.connect_read_only(path)
+        try:
+            columns = [column[1] for column in connection.execute("PRAGMA table_info(tender_values)")]
+            # stores written before the row column only have the first row of every tender
+            first_rows = "WHERE row = 0 " if "row" in columns else ""
+            rows = connection.execute("SELECT tender_id, column_name, value FROM tender_values " + first_rows + "ORDER BY tender_id, position")
+            tenders = {}
+            for tender_id, column_name, value in rows:
+                tenders.setdefault(tender_id, []).append((column_name, value))
+        finally:
+            connection.close()
+        return list(tenders.values())
@@ -0,0 +1,48 @@
+import glob
+import os
+import sys
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import mch_tenders
+
+MONTHLY_TENDERS = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'monthly_tenders'))
+MONTHLY_CSVS = sorted(glob.glob(os.path.join(MONTHLY_TENDERS, '*.csv')))
+
+
+@pytest.mark.skipif(not MONTHLY_CSVS, reason=f"no monthly csvs in {MONTHLY_TENDERS}, run the scraper first")
+@pytest.mark.parametrize("csv", MONTHLY_CSVS, ids=os.path.basename)
+def test_engines_agree(csv):
+    """
+    The vectorized engine adds the same columns, with the same values, as the row-wise one
+    """
+    input_df = mch_tenders.read_monthly_tenders(csv)
+    rowwise_df = mch_tenders.classify_rowwise(input_df.copy())
+    vectorized_df = mch_tenders.classify_vectorized(input_df.copy())
+    # dtypes are left out: newer pandas infers a string dtype for the row-wise lists
+    pd.testing.assert_frame_equal(rowwise_df, vectorized_df, check_dtype=False)
+
+
+@pytest.mark.skipif(not MONTHLY_CSVS, reason=f"no monthly csvs in {MONTHLY_TENDERS}, run the scraper first")
+def test_stream_matches_batch(tmp_path):
+    """
+    --stream writes the same month files and mch_tenders_all.csv as the batch mode
+    """
+    index_path = os.path.join(MONTHLY_TENDERS, 'tender_index.json')
+    batch_dir = tmp_path / 'batch'
+    stream_dir = tmp_path / 'stream'
+    batch_dir.mkdir()
+    stream_dir.mkdir()
+
+    dfs = mch_tenders.write_monthly_outputs(mch_tenders.classify_months(MONTHLY_CSVS, 'vectorized', 1), str(batch_dir))
+    mch_tenders.concatenate_monthly_outputs(dfs, str(tmp_path / 'batch_all.csv'), index_path)
+    # chunks smaller than most months, so months and tenders span several chunks
+    mch_tenders.classify_stream(mch_tenders.stream_chunks(MONTHLY_CSVS, 500), 'vectorized', str(stream_dir),
+                                str(tmp_path / 'stream_all.csv'), mch_tenders.stream_columns(MONTHLY_CSVS),
+                                kept_months=mch_tenders.read_kept_months(index_path))
+
+    assert sorted(os.listdir(stream_dir)) == sorted(os.listdir(batch_dir))
+    for filename in os.listdir(batch_dir):
+        assert (stream_dir / filename).read_bytes() == (batch_dir / filename).read_bytes(), filename
+    assert (tmp_path / 'stream_all.csv').read_bytes() == (tmp_path / 'batch_all.csv').read_bytes()